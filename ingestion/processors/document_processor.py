@@ -16,6 +16,7 @@ class DocumentProcessorImpl(DocumentProcessor):
             separators=["\n\n", "\n", ".", "?", "!", " ", ""],
             chunk_size=config.splitter.CHUNK_SIZE,
             chunk_overlap=0,
+            add_start_index=True,
         )
 
     def process(self, docs: list[CustomDocument]) -> list[Document]:
@@ -22,7 +22,10 @@ class MessageModel(BaseModel):
 
 class RequestModel(BaseModel):
     messages: List[MessageModel] = Field(description="The conversation messages to send to the knowledge agent")
-    chatId: str = Field(default="default", description="The chat session identifier")
+    chatId: str = Field(
+        default="default",
+        description="The chat session identifier, with a non-default chatId only the new user message has to be sent",
+    )
 
     @field_validator("messages")
     @classmethod
@@ -48,3 +51,7 @@ class RequestModel(BaseModel):
             raise ValueError("First message in a conversation should be from user")
 
         return messages
+
+
+class BatchRequestModel(BaseModel):
+    requests: List[RequestModel] = Field(description="Independent conversations to answer, chatId is not used")
@@ -1,18 +1,111 @@
+import asyncio
+import json
 from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator
 
-from api.common_types import RequestModel
+from api.common_types import BatchRequestModel, MessageModel, RequestModel
 from bll.agents.knowledge import Knowledge
+from core.config.config import config
+from core.logger import logger
+from core.utils.admission import AdmissionController, AdmissionRejectedError
+from core.utils.gcp_secret import prefetch_secrets
+from core.utils.metrics import registry
+from core.utils.startup import startup_report
+from core.utils.tracing import trace_exporter
+from dal.conversation_store import Conversation, ConversationStore
 from dal.mongo_db import MongoDB
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+
+async def _run_warm_up(agent: Knowledge) -> dict[str, str]:
+    """One warm-up attempt, returning the outcome of each step, a timeout or error of the whole attempt included."""
+    try:
+        return await asyncio.wait_for(
+            agent.awarm_up(config.warmup.PROBE_QUERY, warm_llm=config.warmup.WARM_LLM),
+            timeout=config.warmup.TIMEOUT_SECONDS,
+        )
+    except asyncio.TimeoutError:
+        return {"warmup": f"TimeoutError: not finished within {config.warmup.TIMEOUT_SECONDS}s"}
+    except Exception as e:
+        logger.exception("Warm-up failed")
+        return {"warmup": f"{type(e).__name__}: {e}"}
+
+
+async def _warm_up(agent: Knowledge) -> None:
+    """
+    Warm the clients in the background and mark the app ready once every required step succeeded.
+
+    Failed attempts are retried after WarmupConfig.RETRY_SECONDS, until then /ready reports the failure.
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        with startup_report.phase("warmup"):
+            results = await _run_warm_up(agent)
+        failed = {
+            step: outcome
+            for step, outcome in results.items()
+            if outcome != "ok" and step not in config.warmup.OPTIONAL_STEPS
+        }
+        app.state.warm_up = {"attempts": attempt, "results": results}
+        if attempt == 1:
+            startup_report.log()
+        if not failed:
+            logger.info(f"Warm-up finished: {results}")
+            app.state.ready = True
+            return
+        logger.error(f"Warm-up attempt {attempt} failed, retrying in {config.warmup.RETRY_SECONDS}s: {failed}")
+        await asyncio.sleep(config.warmup.RETRY_SECONDS)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Secrets and clients are created lazily, this is where the expensive startup work happens once
+    with startup_report.phase("secrets"):
+        await asyncio.to_thread(prefetch_secrets, list(config.secrets))
+    with startup_report.phase("clients"):
+        await asyncio.gather(
+            asyncio.to_thread(MongoDB.connect),
+            asyncio.to_thread(lambda: config.langfuse_handler),
+        )
+    app.state.ready = False
+    app.state.warm_up = None
     app.state.db_client = MongoDB()
-    app.state.knowledge_agent = Knowledge()
+    with startup_report.phase("knowledge_agent"):
+        app.state.knowledge_agent = await asyncio.to_thread(Knowledge)
+    app.state.admission = AdmissionController(
+        max_concurrent=config.admission.MAX_CONCURRENT_REQUESTS,
+        max_queued=config.admission.MAX_QUEUED_REQUESTS,
+        queue_timeout_seconds=config.admission.QUEUE_TIMEOUT_SECONDS,
+        retry_after_seconds=config.admission.RETRY_AFTER_SECONDS,
+    )
+    app.state.conversation_store = None
+    if config.conversation.ENABLED:
+        app.state.conversation_store = ConversationStore(
+            collection_name=config.conversation.COLLECTION_NAME,
+            cache_size=config.conversation.CACHE_SIZE,
+            cache_ttl_seconds=config.conversation.CACHE_TTL_SECONDS,
+            max_messages=config.conversation.MAX_MESSAGES,
+        )
+
+    warm_up_task = None
+    if config.warmup.ENABLED:
+        warm_up_task = asyncio.create_task(_warm_up(app.state.knowledge_agent))
+    else:
+        app.state.ready = True
+        startup_report.log()
     yield
-    app.state.db_client.close()
+    if warm_up_task is not None:
+        warm_up_task.cancel()
+    await asyncio.to_thread(trace_exporter.close)
+    if app.state.knowledge_agent.answer_cache is not None:
+        await asyncio.to_thread(app.state.knowledge_agent.answer_cache.close)
+    if app.state.knowledge_agent.web_search_retriever is not None:
+        await app.state.knowledge_agent.web_search_retriever.aclose()
+    await app.state.db_client.aclose()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -26,20 +119,206 @@ app.add_middleware(
 )
 
 
+@app.exception_handler(AdmissionRejectedError)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejectedError):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": "The assistant is busy, please retry later.", "reason": exc.reason},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+async def _prepare_input(
+    request: RequestModel, request_timeout: float | None, force_trace: bool
+) -> tuple[dict, Conversation | None]:
+    """
+    Build the agent input, using the server-side conversation when the request carries a chatId.
+
+    With a stored conversation only the last message of the request is used, the earlier messages and
+    the history summary come from the store. A chat without stored state is seeded from the history
+    sent by the client.
+    """
+    messages = [msg.to_langchain_message() for msg in request.messages]
+    input_data = {"messages": messages, "deadline_seconds": request_timeout, "force_trace": force_trace}
+
+    store: ConversationStore | None = app.state.conversation_store
+    if store is None or request.chatId == "default" or not messages:
+        return input_data, None
+
+    conversation = await store.aget(request.chatId)
+    if conversation is None:
+        conversation = Conversation(request.chatId, [msg.model_dump() for msg in request.messages[:-1]])
+        return input_data, conversation
+
+    history = [MessageModel(**message).to_langchain_message() for message in conversation.messages]
+    return input_data | {
+        "messages": history + messages[-1:],
+        "history_summary": conversation.history_summary,
+    }, conversation
+
+
+async def _remember_turn(conversation: Conversation | None, request: RequestModel, result: dict) -> None:
+    if conversation is None or "error" in result or not result.get("answer"):
+        return
+    store: ConversationStore = app.state.conversation_store
+    try:
+        await store.aappend_turn(
+            conversation,
+            request.messages[-1].content,
+            result["answer"],
+            result.get("history_summary", {}),
+        )
+    except Exception as e:
+        logger.error(f"Failed to record turn of chat '{conversation.chat_id}': {e}")
+
+
 @app.post("/prompt")
-async def prompt(request: RequestModel):
-    messages = request.messages
-    messages = [msg.to_langchain_message() for msg in messages]
+async def prompt(
+    request: RequestModel,
+    request_timeout: float | None = Header(default=None, alias=config.deadline.HEADER),
+    force_trace: bool = Header(default=False, alias=config.tracing.FORCE_HEADER),
+):
+    input_data, conversation = await _prepare_input(request, request_timeout, force_trace)
 
     agent: Knowledge = app.state.knowledge_agent
+    admission: AdmissionController = app.state.admission
 
-    context = await agent.ainvoke({"messages": messages})
+    # Admission happens inside, so requests coalesced with an in-flight one do not take a slot
+    context = await agent.ainvoke(input_data, admission=admission)
+    if "error" in context:
+        raise HTTPException(status_code=504 if context["error"] == "timeout" else 500, detail=context["content"])
+    await _remember_turn(conversation, request, context)
     answer = context["answer"]
     response_chunk = {"message": {"role": "ai", "content": answer}, "metadata": context}
 
     return response_chunk
 
 
+def _format_sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data), ensure_ascii=False)}\n\n"
+
+
+class _AdmittedStreamingResponse(StreamingResponse):
+    """Streaming response holding an admission slot, if any, released however the response ends."""
+
+    def __init__(self, content, admission: AdmissionController | None, **kwargs):
+        super().__init__(content, **kwargs)
+        self.admission = admission
+
+    async def __call__(self, scope, receive, send) -> None:
+        # Also runs when the client disconnects before the body iterator is started or finished
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            if self.admission is not None:
+                self.admission.release()
+
+
+async def _stream_events(
+    agent: Knowledge, input_data: dict, request: RequestModel, conversation: Conversation | None
+) -> AsyncGenerator[str, None]:
+    async for event in agent.astream_answer(input_data):
+        if event["event"] == "done":
+            metadata = event["data"]
+            data = {"message": {"role": "ai", "content": metadata["answer"]}, "metadata": metadata}
+            yield _format_sse("done", data)
+            await _remember_turn(conversation, request, metadata)
+        else:
+            yield _format_sse(event["event"], event["data"])
+
+
+@app.post("/prompt/stream")
+async def prompt_stream(
+    request: RequestModel,
+    request_timeout: float | None = Header(default=None, alias=config.deadline.HEADER),
+    force_trace: bool = Header(default=False, alias=config.tracing.FORCE_HEADER),
+):
+    input_data, conversation = await _prepare_input(request, request_timeout, force_trace)
+
+    agent: Knowledge = app.state.knowledge_agent
+    admission: AdmissionController | None = app.state.admission
+
+    if await agent.alookup_cached_answer(input_data):
+        admission = None
+    else:
+        # Acquire before the response starts so a rejection is still a real HTTP status
+        await admission.acquire()
+    return _AdmittedStreamingResponse(
+        _stream_events(agent, input_data, request, conversation),
+        admission,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _answer_batch_item(
+    index: int,
+    messages: list,
+    agent: Knowledge,
+    admission: AdmissionController,
+    semaphore: asyncio.Semaphore,
+    force_trace: bool,
+) -> dict:
+    async with semaphore:
+        try:
+            context = await agent.ainvoke({"messages": messages, "force_trace": force_trace}, admission=admission)
+        except AdmissionRejectedError as e:
+            return {"index": index, "error": e.reason}
+
+    if "error" in context:
+        return {"index": index, "error": context["error"]}
+    return {"index": index, "message": {"role": "ai", "content": context["answer"]}, "metadata": context}
+
+
+async def _stream_batch(conversations: list[list], agent: Knowledge, admission: AdmissionController, force_trace: bool):
+    """Answer the conversations with bounded concurrency, yielding one NDJSON line per item as it completes."""
+    await agent.aprime_embeddings(conversations)
+
+    semaphore = asyncio.Semaphore(config.batch.CONCURRENCY)
+    tasks = [
+        asyncio.ensure_future(_answer_batch_item(index, messages, agent, admission, semaphore, force_trace))
+        for index, messages in enumerate(conversations)
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield json.dumps(jsonable_encoder(await next_done), ensure_ascii=False) + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+@app.post("/prompt/batch")
+async def prompt_batch(
+    batch: BatchRequestModel,
+    force_trace: bool = Header(default=False, alias=config.tracing.FORCE_HEADER),
+):
+    if len(batch.requests) > config.batch.MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"A batch can contain at most {config.batch.MAX_ITEMS} requests")
+
+    conversations = [[msg.to_langchain_message() for msg in request.messages] for request in batch.requests]
+
+    agent: Knowledge = app.state.knowledge_agent
+    admission: AdmissionController = app.state.admission
+
+    return StreamingResponse(
+        _stream_batch(conversations, agent, admission, force_trace), media_type="application/x-ndjson"
+    )
+
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/health")
 async def health_check():
     return {"status": "healthy"}
+
+
+@app.get("/ready")
+async def readiness_check():
+    if not app.state.ready:
+        warm_up = app.state.warm_up
+        status = "warming_up" if warm_up is None else "warm_up_failed"
+        return JSONResponse(status_code=503, content={"status": status, "warm_up": warm_up})
+    return {"status": "ready"}
@@ -1,3 +1,4 @@
+import importlib.util
 import os
 import sys
 
@@ -5,6 +6,47 @@ import uvicorn
 
 sys.path.append(os.path.join(os.getcwd(), "server"))
 from api.endpoints import app
+from core.config.config import ENVIRONMENT, config
+from core.logger import logger
+
+
+def _is_installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def worker_count() -> int:
+    """Configured worker count, or one worker per core available to this process."""
+    if config.server.WORKERS > 0:
+        return config.server.WORKERS
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def run_production() -> None:
+    """Serve with one process per core, with uvloop and httptools when they are installed."""
+    loop = "uvloop" if _is_installed("uvloop") else "asyncio"
+    http = "httptools" if _is_installed("httptools") else "h11"
+    workers = worker_count()
+    logger.info(f"Starting {workers} workers on {config.server.HOST}:{config.server.PORT} ({loop}, {http})")
+    uvicorn.run(
+        "api.endpoints:app",
+        host=config.server.HOST,
+        port=config.server.PORT,
+        workers=workers,
+        loop=loop,
+        http=http,
+        timeout_keep_alive=config.server.KEEP_ALIVE_SECONDS,
+        timeout_graceful_shutdown=config.server.GRACEFUL_SHUTDOWN_SECONDS,
+        backlog=config.server.BACKLOG,
+        # Keep the queued handlers of core.logger instead of uvicorn's own logging config
+        log_config=None,
+        access_log=False,
+    )
+
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="localhost", port=8081, log_level="debug")
+    if config.environment == ENVIRONMENT.PRODUCTION:
+        run_production()
+    else:
+        uvicorn.run(app, host="localhost", port=8081, log_level="debug")
@@ -0,0 +1,158 @@
+"""
+Offline load test of the /prompt endpoint.
+
+Boots the FastAPI app in-process with the mock retrievers, the mock chat model and the mock embedder of
+`dal.mocks`, so no Vertex AI, Atlas or Tavily access is needed, and reports throughput and per-stage
+latency percentiles. Run it from the repository root:
+
+    python server/benchmark/load_test.py --requests 200 --concurrency 16
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from argparse import ArgumentParser, Namespace
+from contextlib import asynccontextmanager
+
+import httpx
+import numpy as np
+
+# Debug logging of every request to stdout would dominate the measurement
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+sys.path.append(os.path.join(os.getcwd(), "server"))
+from api.endpoints import app
+from bll.agents.knowledge import Knowledge
+from core.config.config import config
+from core.utils.admission import AdmissionController
+from core.utils.components import MOCK_MODEL, get_embedding
+from dal.mocks import MockBaseRetriever, MockWebSearchRetriever
+
+QUESTIONS = [
+    "What is the deadline for paying the tuition fee?",
+    "How can I register for an exam in NEPTUN?",
+    "Where can I apply for a dormitory place?",
+    "What documents do I need for the final exam?",
+    "How many credits do I need to finish the semester?",
+    "How can I request a student certificate?",
+    "What happens if I miss the course registration period?",
+    "Can I pay the tuition fee in installments?",
+]
+
+
+def parse_args() -> Namespace:
+    parser = ArgumentParser(description="Offline load test of the /prompt endpoint with mock models and retrievers")
+    parser.add_argument("--requests", "-n", type=int, default=200, help="Total number of requests.")
+    parser.add_argument("--concurrency", "-c", type=int, default=16, help="Requests in flight at the same time.")
+    parser.add_argument("--history-turns", type=int, default=0, help="Earlier turns sent with every request.")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Mock LLM time to first token in seconds.")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=100.0, help="Mock LLM generation speed.")
+    parser.add_argument("--llm-output-tokens", type=int, default=120, help="Tokens generated per mock LLM call.")
+    parser.add_argument("--embedding-latency", type=float, default=0.05, help="Mock embedding call latency.")
+    parser.add_argument("--db-latency", type=float, default=0.05, help="Mock vector search latency.")
+    parser.add_argument("--web-latency", type=float, default=0.3, help="Mock web search latency.")
+    parser.add_argument("--json", action="store_true", default=False, help="Print the report as JSON.")
+    return parser.parse_args()
+
+
+def configure(args: Namespace) -> None:
+    """Point the server at the mocks and turn off everything that needs external services."""
+    config.llm = MOCK_MODEL
+    config.embedding = MOCK_MODEL
+    config.mock.LLM_LATENCY_SECONDS = args.llm_latency
+    config.mock.LLM_TOKENS_PER_SECOND = args.llm_tokens_per_second
+    config.mock.LLM_OUTPUT_TOKENS = args.llm_output_tokens
+    config.mock.EMBEDDING_LATENCY_SECONDS = args.embedding_latency
+    config.knowledge.ANSWER_CACHE_ENABLED = False
+    config.metrics.INCLUDE_TIMINGS = True
+    config.tracing.ENABLED = False
+
+
+@asynccontextmanager
+async def offline_app_state(args: Namespace):
+    """Set up the state the lifespan of the app would, with the mocks instead of MongoDB and Tavily."""
+    app.state.knowledge_agent = Knowledge(
+        db_retriever=MockBaseRetriever(delay=args.db_latency, embedding=get_embedding()),
+        web_search_retriever=MockWebSearchRetriever(delay=args.web_latency),
+    )
+    app.state.admission = AdmissionController(
+        max_concurrent=config.admission.MAX_CONCURRENT_REQUESTS,
+        max_queued=config.admission.MAX_QUEUED_REQUESTS,
+        queue_timeout_seconds=config.admission.QUEUE_TIMEOUT_SECONDS,
+        retry_after_seconds=config.admission.RETRY_AFTER_SECONDS,
+    )
+    app.state.conversation_store = None
+    app.state.ready = True
+    yield
+
+
+def build_request(index: int, history_turns: int) -> dict:
+    messages = []
+    for turn in range(history_turns):
+        messages.append({"role": "user", "content": QUESTIONS[(index + turn) % len(QUESTIONS)]})
+        messages.append({"role": "ai", "content": f"Answer number {turn} about the university."})
+    # The request number keeps every prompt unique, so coalescing never merges two requests
+    messages.append({"role": "user", "content": f"{QUESTIONS[index % len(QUESTIONS)]} (request {index})"})
+    return {"messages": messages}
+
+
+async def run(args: Namespace) -> dict:
+    latencies: list[float] = []
+    stages: dict[str, list[float]] = {}
+    statuses: dict[int, int] = {}
+    pending = iter(range(args.requests))
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        for index in pending:
+            start = time.perf_counter()
+            response = await client.post("/prompt", json=build_request(index, args.history_turns))
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code == 200:
+                for stage, ms in response.json()["metadata"].get("timings", {}).items():
+                    stages.setdefault(stage, []).append(ms)
+
+    async with offline_app_state(args):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            start = time.perf_counter()
+            await asyncio.gather(*(worker(client) for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - start
+
+    return {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(args.requests / elapsed, 2),
+        "statuses": statuses,
+        "latency_ms": percentiles(latencies),
+        "stages_ms": {stage: percentiles(values) for stage, values in sorted(stages.items())},
+    }
+
+
+def percentiles(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": round(p50, 2), "p95": round(p95, 2), "p99": round(p99, 2), "count": len(values)}
+
+
+def print_report(report: dict) -> None:
+    print(
+        f"{report['requests']} requests, concurrency {report['concurrency']}: "
+        f"{report['throughput_rps']} req/s in {report['elapsed_s']}s, statuses {report['statuses']}"
+    )
+    print(f"{'stage':<24}{'p50 ms':>12}{'p95 ms':>12}{'p99 ms':>12}{'count':>8}")
+    for stage, p in [("request", report["latency_ms"])] + list(report["stages_ms"].items()):
+        print(f"{stage:<24}{p['p50']:>12}{p['p95']:>12}{p['p99']:>12}{p['count']:>8}")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    configure(args)
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
@@ -3,6 +3,9 @@ from typing import Any, AsyncGenerator, Generator
 
 from core.config.config import config
 from core.logger import logger
+from core.utils.deadline import Deadline, start_deadline
+from core.utils.metrics import llm_latency_handler, stage_timer, start_request_timings
+from core.utils.tracing import TraceRecorder, finish_trace, start_trace
 from langchain_core.language_models import BaseLanguageModel
 
 
@@ -30,80 +33,136 @@ class BaseAgent(ABC):
             else:
                 print(f"[{self.__class__.__name__}] {message}")
 
+    @staticmethod
+    def _run_config(trace: TraceRecorder | None) -> dict[str, Any]:
+        if trace is None:
+            return {"callbacks": [llm_latency_handler]}
+        return {"callbacks": [trace, llm_latency_handler]}
+
+    @staticmethod
+    def _attach_request_metadata(
+        result: dict[str, Any], timings: dict[str, float], deadline: Deadline
+    ) -> dict[str, Any]:
+        if config.metrics.INCLUDE_TIMINGS:
+            result["timings"] = timings
+        result["deadline"] = deadline.report()
+        return result
+
     def invoke(self, input_data: dict[str, Any]) -> dict[str, Any]:
         """
         Synchronous invocation of the agent.
 
         Args:
-            input_data: The input dictionary
+            input_data: The input dictionary, `deadline_seconds` overrides the default request deadline,
+                `deadline` continues a deadline started before the call and `force_trace` keeps the trace
+                regardless of sampling
 
         Returns:
             The agent's response as a dictionary
         """
+        timings = start_request_timings()
+        deadline = start_deadline(input_data.pop("deadline_seconds", None), input_data.pop("deadline", None))
+        trace = start_trace(input_data.pop("force_trace", False))
+        failed = True
         try:
-            result = self.chain.invoke(input_data, config={"callbacks": [config.langfuse_handler]})
+            with stage_timer("total"):
+                result = self.chain.invoke(input_data, config=self._run_config(trace))
             if isinstance(result, dict):
-                return result
+                failed = "error" in result
+                return self._attach_request_metadata(result, timings, deadline)
+            failed = False
             return {"content": str(result)}
         except Exception as e:
             logger.error(f"Error in invoke: {str(e)}")
             return {"error": str(e), "content": f"I encountered an error while processing your request: {str(e)}"}
+        finally:
+            finish_trace(trace, failed)
 
     async def ainvoke(self, input_data: dict[str, Any]) -> dict[str, Any]:
         """
         Asynchronous invocation of the agent.
 
         Args:
-            input_data: The input dictionary
+            input_data: The input dictionary, `deadline_seconds` overrides the default request deadline
+                and `force_trace` keeps the trace regardless of sampling
 
         Returns:
             The agent's response as a dictionary
         """
+        timings = start_request_timings()
+        deadline = start_deadline(input_data.pop("deadline_seconds", None))
+        trace = start_trace(input_data.pop("force_trace", False))
+        failed = True
         try:
-            result = await self.chain.ainvoke(input_data, config={"callbacks": [config.langfuse_handler]})
+            with stage_timer("total"):
+                result = await self.chain.ainvoke(input_data, config=self._run_config(trace))
             if isinstance(result, dict):
-                return result
+                failed = "error" in result
+                return self._attach_request_metadata(result, timings, deadline)
+            failed = False
             return {"content": str(result)}
         except Exception as e:
             logger.error(f"Error in ainvoke: {str(e)}")
             return {"error": str(e), "content": f"I encountered an error while processing your request: {str(e)}"}
+        finally:
+            finish_trace(trace, failed)
 
     def stream(self, input_data: dict[str, Any]) -> Generator[dict[str, Any], None, None]:
         """
         Stream the agent's response.
 
         Args:
-            input_data: The input dictionary
+            input_data: The input dictionary, `deadline_seconds` overrides the default request deadline
+                and `force_trace` keeps the trace regardless of sampling
 
         Yields:
             Chunks of the agent's response as dictionaries
         """
+        timings = start_request_timings()
+        deadline = start_deadline(input_data.pop("deadline_seconds", None))
+        trace = start_trace(input_data.pop("force_trace", False))
+        failed = False
         try:
-            for chunk in self.chain.stream(input_data, config={"callbacks": [config.langfuse_handler]}):
-                if isinstance(chunk, dict):
-                    yield chunk
-                else:
-                    yield {"content": str(chunk)}
+            with stage_timer("total"):
+                for chunk in self.chain.stream(input_data, config=self._run_config(trace)):
+                    if isinstance(chunk, dict):
+                        yield chunk
+                    else:
+                        yield {"content": str(chunk)}
+            yield self._attach_request_metadata({}, timings, deadline)
         except Exception as e:
+            failed = True
             logger.error(f"Error in stream: {str(e)}")
             yield {"error": str(e), "content": f"Error: {str(e)}"}
+        finally:
+            finish_trace(trace, failed)
 
     async def astream(self, input_data: dict[str, Any]) -> AsyncGenerator[dict[str, Any], None]:
         """
         Asynchronously stream the agent's response.
 
         Args:
-            input_data: The input dictionary
+            input_data: The input dictionary, `deadline_seconds` overrides the default request deadline
+                and `force_trace` keeps the trace regardless of sampling
 
         Yields:
             Chunks of the agent's response as dictionaries
         """
+        timings = start_request_timings()
+        deadline = start_deadline(input_data.pop("deadline_seconds", None))
+        trace = start_trace(input_data.pop("force_trace", False))
+        failed = False
         try:
-            async for chunk in self.chain.astream(input_data, config={"callbacks": [config.langfuse_handler]}):
-                if isinstance(chunk, dict):
-                    yield chunk
-                else:
-                    yield {"content": str(chunk)}
+            with stage_timer("total"):
+                async for chunk in self.chain.astream(input_data, config=self._run_config(trace)):
+                    if isinstance(chunk, dict):
+                        yield chunk
+                    else:
+                        yield {"content": str(chunk)}
+            yield self._attach_request_metadata({}, timings, deadline)
         except Exception as e:
+            failed = True
             logger.error(f"Error in astream: {str(e)}")
             yield {"error": str(e), "content": f"Error: {str(e)}"}
+        finally:
+            finish_trace(trace, failed)
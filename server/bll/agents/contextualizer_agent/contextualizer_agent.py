@@ -1,21 +1,93 @@
+import asyncio
+import hashlib
+
+from core.config.config import config
+from core.logger import logger
 from core.utils.components import get_llm
+from core.utils.deadline import current_deadline
+from core.utils.metrics import stage_timer
+from core.utils.ttl_cache import TTLCache
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnableLambda
 
 from bll.agents.base_agent import BaseAgent
 from bll.agents.contextualizer_agent.prompt import CONTEXTUALIZER_PROMPT
+from bll.agents.contextualizer_agent.self_contained import is_self_contained
 
 
 class ContextualizerAgent(BaseAgent):
     def __init__(self):
+        self.cache: TTLCache[str] = TTLCache(
+            max_size=config.contextualizer.CACHE_SIZE,
+            ttl_seconds=config.contextualizer.CACHE_TTL_SECONDS,
+        )
         super().__init__(get_llm(), verbose=True)
 
+    @staticmethod
+    def _cache_key(input_dict) -> str:
+        return hashlib.sha256(f"{input_dict['history']}\x00{input_dict['prompt']}".encode()).hexdigest()
+
+    def _shortcut(self, input_dict) -> tuple[str, str] | None:
+        """Resolve the contextual prompt without the LLM when possible, returning it with its source."""
+        if len(input_dict.get("history", "")) == 0:
+            return input_dict["prompt"], "none"
+        if config.contextualizer.SKIP_SELF_CONTAINED and is_self_contained(
+            input_dict["prompt"],
+            config.contextualizer.DOMAIN_TERMS,
+            config.contextualizer.MIN_SELF_CONTAINED_WORDS,
+        ):
+            logger.debug("Prompt is self-contained, skipping contextualization")
+            return input_dict["prompt"], "skipped"
+        cached = self.cache.get(self._cache_key(input_dict))
+        if cached is not None:
+            return cached, "cached"
+        return None
+
+    @staticmethod
+    def _timeout() -> float | None:
+        """Sub-budget of the contextualizer LLM call, 0 when the deadline leaves no room for it."""
+        deadline = current_deadline()
+        if deadline is None:
+            return None
+        timeout = deadline.share(config.deadline.CONTEXTUALIZE_SHARE)
+        if timeout < config.deadline.CONTEXTUALIZE_MIN_SECONDS:
+            deadline.degrade("contextualization_skipped")
+            return 0.0
+        return timeout
+
     def _contextualize(self, input_dict) -> str:
         formatted_prompt = CONTEXTUALIZER_PROMPT.format_prompt(**input_dict)
         return StrOutputParser().invoke(self.llm.invoke(formatted_prompt))
 
-    def _process_input(self, input_dict) -> str:
-        return input_dict["prompt"] if len(input_dict.get("history", "")) == 0 else self._contextualize(input_dict)
+    async def _acontextualize(self, input_dict) -> str:
+        formatted_prompt = CONTEXTUALIZER_PROMPT.format_prompt(**input_dict)
+        return StrOutputParser().invoke(await self.llm.ainvoke(formatted_prompt))
+
+    def _process_input(self, input_dict) -> dict:
+        with stage_timer("contextualize"):
+            contextual_prompt, source = self._shortcut(input_dict) or (None, "llm")
+            if contextual_prompt is None and self._timeout() == 0.0:
+                contextual_prompt, source = input_dict["prompt"], "deadline"
+            elif contextual_prompt is None:
+                contextual_prompt = self._contextualize(input_dict)
+                self.cache.put(self._cache_key(input_dict), contextual_prompt)
+        return input_dict | {"contextual_prompt": contextual_prompt, "contextualization": source}
+
+    async def _aprocess_input(self, input_dict) -> dict:
+        with stage_timer("contextualize"):
+            contextual_prompt, source = self._shortcut(input_dict) or (None, "llm")
+            if contextual_prompt is None:
+                timeout = self._timeout()
+                if timeout == 0.0:
+                    contextual_prompt, source = input_dict["prompt"], "deadline"
+                else:
+                    try:
+                        contextual_prompt = await asyncio.wait_for(self._acontextualize(input_dict), timeout)
+                        self.cache.put(self._cache_key(input_dict), contextual_prompt)
+                    except asyncio.TimeoutError:
+                        current_deadline().degrade("contextualization_timeout")
+                        contextual_prompt, source = input_dict["prompt"], "deadline"
+        return input_dict | {"contextual_prompt": contextual_prompt, "contextualization": source}
 
     def _build_chain(self):
-        return RunnablePassthrough.assign(contextual_prompt=self._process_input)
+        return RunnableLambda(self._process_input, afunc=self._aprocess_input)
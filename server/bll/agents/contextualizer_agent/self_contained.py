@@ -0,0 +1,33 @@
+import re
+
+# Words that point back into the conversation (English and Hungarian).
+REFERENTIAL_WORDS = frozenset(
+    {
+        "it", "its", "this", "that", "these", "those", "they", "them", "their", "he", "she", "him", "her",
+        "there", "then", "such", "same", "above", "previous", "former", "latter", "else",
+        "ez", "ezt", "azt", "ezek", "azok", "ennek", "annak", "ebben", "abban", "erre", "arra",
+        "ehhez", "ahhoz", "ezzel", "azzal", "ott", "itt", "akkor", "ilyen", "olyan", "ugyanez", "ugyanaz",
+        "előbbi", "utóbbi", "fenti", "említett", "ő", "ők", "őt", "neki", "nekik",
+    }
+)  # fmt: skip
+
+# Openers of elliptical follow-ups like "and the fees?" or "what about the deadline?".
+ELLIPTICAL_OPENERS = ("and ", "also ", "what about", "how about", "és ", "meg ", "mi a helyzet", "mi van")
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def is_self_contained(prompt: str, domain_terms: tuple[str, ...], min_words: int = 4) -> bool:
+    """
+    Cheap heuristic deciding whether a follow-up message can be answered without its history.
+
+    A message is self-contained when it is long enough, has no referential words or elliptical
+    opener, and mentions at least one domain term (matched as a word prefix to tolerate inflection).
+    """
+    text = prompt.strip().casefold()
+    words = WORD_PATTERN.findall(text)
+    if len(words) < min_words or text.startswith(ELLIPTICAL_OPENERS) or "..." in text:
+        return False
+    if any(word in REFERENTIAL_WORDS for word in words):
+        return False
+    return any(word.startswith(term) for word in words for term in domain_terms)
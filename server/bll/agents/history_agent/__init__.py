@@ -0,0 +1,4 @@
+from bll.agents.history_agent.history_agent import HistoryAgent
+from bll.agents.history_agent.prompt import HISTORY_SUMMARY_PROMPT
+
+__all__ = ["HistoryAgent", "HISTORY_SUMMARY_PROMPT"]
@@ -0,0 +1,147 @@
+import asyncio
+import hashlib
+
+from core.config.config import config
+from core.logger import logger
+from core.utils.components import get_llm
+from core.utils.deadline import current_deadline
+from core.utils.metrics import stage_timer
+from core.utils.ttl_cache import TTLCache
+from langchain_core.messages import BaseMessage, HumanMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda
+
+from bll.agents.base_agent import BaseAgent
+from bll.agents.history_agent.prompt import HISTORY_SUMMARY_PROMPT
+
+
+class HistoryAgent(BaseAgent):
+    """
+    Compresses the conversation history into a running summary and a window of recent turns.
+
+    The last `WINDOW_TURNS` turns are kept verbatim, older turns are folded into the summary in steps of
+    `SUMMARY_REFRESH_TURNS`, so the summary LLM only runs when the window slides a full step. Summaries are
+    cached on a hash of the folded messages, and a summary state passed in `history_summary` (e.g. from the
+    conversation store) is extended instead of recomputed. When the request deadline leaves no room for the
+    summary call, the turns not yet summarized are kept verbatim instead.
+    """
+
+    def __init__(self):
+        self.cache: TTLCache[str] = TTLCache(
+            max_size=config.history.CACHE_SIZE,
+            ttl_seconds=config.history.CACHE_TTL_SECONDS,
+        )
+        super().__init__(get_llm(), verbose=True)
+
+    @staticmethod
+    def _render(message: BaseMessage) -> str:
+        content = str(message.content)
+        if len(content) > config.history.MESSAGE_MAX_CHARS:
+            content = content[: config.history.MESSAGE_MAX_CHARS] + "..."
+        return ("User: " if isinstance(message, HumanMessage) else "AI: ") + content
+
+    @staticmethod
+    def _prefix_keys(messages: list[BaseMessage], cut: int, step: int) -> dict[int, str]:
+        """Hash of every folded prefix messages[:i] for i = step, 2 * step, ..., cut."""
+        digest = hashlib.sha256()
+        keys = {}
+        for i, message in enumerate(messages[:cut], start=1):
+            digest.update(f"{message.type}\x00{message.content}\x01".encode())
+            if i % step == 0:
+                keys[i] = digest.hexdigest()
+        return keys
+
+    def _plan(self, input_dict) -> tuple[str, int, int, dict[int, str]]:
+        """
+        Decide which messages to fold.
+
+        Returns:
+            The summary to extend, the number of messages it covers, the number of messages that should be
+            summarized after folding and the prefix cache keys
+        """
+        messages = input_dict["history_messages"]
+        window = config.history.WINDOW_TURNS * 2
+        step = config.history.SUMMARY_REFRESH_TURNS * 2
+        cut = max(0, (len(messages) - window) // step * step)
+
+        seed = input_dict.get("history_summary") or {}
+        seed_summary, seed_count = seed.get("summary", ""), seed.get("summarized_messages", 0)
+        if not 0 <= seed_count <= len(messages) - window:
+            seed_summary, seed_count = "", 0
+        if seed_count >= cut:
+            return seed_summary, seed_count, seed_count, {}
+
+        keys = self._prefix_keys(messages, cut, step)
+        for start in range(cut, seed_count, -step):
+            cached = self.cache.get(keys[start])
+            if cached is not None:
+                return cached, start, cut, keys
+        return seed_summary, seed_count, cut, keys
+
+    def _format_summary_prompt(self, input_dict, summary: str, start: int, cut: int):
+        messages = input_dict["history_messages"][start:cut]
+        return HISTORY_SUMMARY_PROMPT.format_prompt(
+            summary=summary or "(empty)",
+            messages="\n".join(self._render(message) for message in messages),
+            max_words=config.history.SUMMARY_MAX_WORDS,
+        )
+
+    @staticmethod
+    def _truncate(summary: str) -> str:
+        words = summary.split()
+        if len(words) > config.history.SUMMARY_MAX_WORDS:
+            logger.debug(f"Truncated history summary from {len(words)} words")
+            return " ".join(words[: config.history.SUMMARY_MAX_WORDS])
+        return summary.strip()
+
+    def _compressed(self, input_dict, summary: str, cut: int) -> dict:
+        recent = [self._render(message) for message in input_dict["history_messages"][cut:]]
+        parts = ([f"Summary of the earlier conversation: {summary}"] if summary else []) + recent
+        return {key: value for key, value in input_dict.items() if key != "history_messages"} | {
+            "history": "\n".join(parts),
+            "history_summary": {"summary": summary, "summarized_messages": cut},
+        }
+
+    @staticmethod
+    def _timeout() -> float | None:
+        """Sub-budget of the summary LLM call, 0 when the deadline leaves no room for it."""
+        deadline = current_deadline()
+        if deadline is None:
+            return None
+        timeout = deadline.share(config.deadline.SUMMARIZE_SHARE)
+        if timeout < config.deadline.SUMMARIZE_MIN_SECONDS:
+            deadline.degrade("summary_skipped")
+            return 0.0
+        return timeout
+
+    def _process_input(self, input_dict) -> dict:
+        with stage_timer("summarize"):
+            summary, start, cut, keys = self._plan(input_dict)
+            if start < cut and self._timeout() == 0.0:
+                # Keep the turns the summary does not cover verbatim, the next request folds them
+                cut = start
+            elif start < cut:
+                prompt = self._format_summary_prompt(input_dict, summary, start, cut)
+                summary = self._truncate(StrOutputParser().invoke(self.llm.invoke(prompt)))
+                self.cache.put(keys[cut], summary)
+            return self._compressed(input_dict, summary, cut)
+
+    async def _aprocess_input(self, input_dict) -> dict:
+        with stage_timer("summarize"):
+            summary, start, cut, keys = self._plan(input_dict)
+            timeout = self._timeout() if start < cut else None
+            if start < cut and timeout == 0.0:
+                cut = start
+            elif start < cut:
+                prompt = self._format_summary_prompt(input_dict, summary, start, cut)
+                try:
+                    response = await asyncio.wait_for(self.llm.ainvoke(prompt), timeout)
+                    summary = self._truncate(StrOutputParser().invoke(response))
+                    self.cache.put(keys[cut], summary)
+                except asyncio.TimeoutError:
+                    current_deadline().degrade("summary_timeout")
+                    cut = start
+            return self._compressed(input_dict, summary, cut)
+
+    def _build_chain(self):
+        return RunnableLambda(self._process_input, afunc=self._aprocess_input)
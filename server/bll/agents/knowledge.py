@@ -1,28 +1,60 @@
+import asyncio
+from functools import partial
+from typing import Any
+
 from core.config.config import config
-from core.utils.components import get_llm
-from dal.mongo_db import MongoRetriever
-from dal.tavily_websearch import TavilyRetriever
+from core.interfaces import BaseRetriever
+from core.logger import logger
+from core.utils.admission import AdmissionController
+from core.utils.components import get_embedding, get_llm
+from core.utils.deadline import Deadline, deadline_budget
+from core.utils.single_flight import SingleFlight
+from dal.local_vector_index import LocalVectorIndex
+from dal.mongo_db import MongoRetriever, get_collection, get_collection_fingerprint
+from dal.tavily_websearch import TavilyRetriever, WebSearchCache
 
+from bll.agents.knowledge_agent.answer_cache import AnswerCache
+from bll.agents.knowledge_agent.context_packer import ContextPacker
 from bll.agents.knowledge_agent.knowledge_agent import KnowledgeAgent
 
 
 class Knowledge(KnowledgeAgent):
-    def __init__(self):
+    def __init__(self, db_retriever: BaseRetriever | None = None, web_search_retriever: BaseRetriever | None = None):
+        """
+        Initialize the university knowledge agent.
+
+        Args:
+            db_retriever: Replaces the MongoDB retriever, e.g. with a mock for offline load tests
+            web_search_retriever: Replaces the Tavily retriever
+        """
+        db_retriever = db_retriever or self._create_db_retriever()
         super().__init__(
             llm=get_llm(),
             domain_context="University of Obuda, student administration, graduate programm and etc.",
-            db_retriever=MongoRetriever(config.mongo.COLLECTION_NAME),
-            web_search_retriever=TavilyRetriever(
+            db_retriever=db_retriever,
+            web_search_retriever=web_search_retriever
+            or TavilyRetriever(
                 include_domains=[
                     "uni-obuda.hu",
                     "uni-obuda.hu/en",
                     "nik.uni-obuda.hu",
                     "neptun.uni-obuda.hu",
                 ],
+                cache=self._create_web_search_cache(),
+                timeout_seconds=config.tavily.TIMEOUT_SECONDS,
+                hedge_quantile=config.tavily.HEDGE_QUANTILE,
             ),
             db_top_k=6,
             web_max_k=3,
             web_supplement_k=2,
+            speculative_web_search=config.knowledge.SPECULATIVE_WEB_SEARCH,
+            answer_cache=self._create_answer_cache(db_retriever),
+            context_packer=ContextPacker(
+                token_budget=config.knowledge.CONTEXT_TOKEN_BUDGET,
+                chars_per_token=config.knowledge.CONTEXT_CHARS_PER_TOKEN,
+                duplicate_threshold=config.knowledge.CONTEXT_DUPLICATE_THRESHOLD,
+                web_share=config.knowledge.CONTEXT_WEB_SHARE,
+            ),
             additional_instructions="""
 - When discussing academic requirements, reference specific systems (like NEPTUN)
 - Include information about deadlines, enrollment periods, and academic calendar
@@ -32,3 +64,88 @@ class Knowledge(KnowledgeAgent):
             """,
             verbose=True,
         )
+        self.single_flight = SingleFlight()
+
+    @staticmethod
+    def _create_db_retriever() -> MongoRetriever | LocalVectorIndex:
+        if config.mongo.LOCAL_INDEX_ENABLED:
+            return LocalVectorIndex(
+                collection=get_collection(config.mongo.DB_NAME, config.mongo.COLLECTION_NAME),
+                embedding=get_embedding(),
+                refresh_interval_seconds=config.mongo.LOCAL_INDEX_REFRESH_SECONDS,
+                use_change_stream=config.mongo.LOCAL_INDEX_USE_CHANGE_STREAM,
+            )
+        return MongoRetriever(config.mongo.COLLECTION_NAME)
+
+    @staticmethod
+    def _create_answer_cache(db_retriever: MongoRetriever | LocalVectorIndex) -> AnswerCache | None:
+        if not config.knowledge.ANSWER_CACHE_ENABLED:
+            return None
+        return AnswerCache(
+            embed_query=db_retriever.embed_query,
+            aembed_query=db_retriever.aembed_query,
+            max_size=config.knowledge.ANSWER_CACHE_SIZE,
+            ttl_seconds=config.knowledge.ANSWER_CACHE_TTL_SECONDS,
+            similarity_threshold=config.knowledge.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+            version_fn=partial(get_collection_fingerprint, config.mongo.DB_NAME, config.mongo.COLLECTION_NAME),
+            version_check_seconds=config.knowledge.ANSWER_CACHE_VERSION_CHECK_SECONDS,
+        )
+
+    @staticmethod
+    def _create_web_search_cache() -> WebSearchCache | None:
+        if not config.tavily.CACHE_ENABLED:
+            return None
+        return WebSearchCache(
+            max_size=config.tavily.CACHE_SIZE,
+            ttl_seconds=config.tavily.CACHE_TTL_SECONDS,
+            stale_seconds=config.tavily.CACHE_STALE_SECONDS,
+            db_path=config.tavily.CACHE_PATH,
+        )
+
+    @staticmethod
+    def _coalescing_key(messages: list) -> tuple:
+        return tuple((message.type, " ".join(str(message.content).split()).casefold()) for message in messages)
+
+    async def _ainvoke_admitted(
+        self, input_data: dict[str, Any], admission: AdmissionController | None, deadline: Deadline
+    ) -> dict[str, Any]:
+        input_data["deadline"] = deadline
+        if admission is None:
+            return await super().ainvoke(input_data)
+        async with admission.slot(timeout=deadline.remaining()):
+            return await super().ainvoke(input_data)
+
+    async def ainvoke(self, input_data: dict[str, Any], admission: AdmissionController | None = None) -> dict[str, Any]:
+        """
+        Asynchronous invocation, concurrent identical conversations share one pipeline execution.
+
+        The request deadline starts before admission, so the time spent waiting for a slot counts against
+        it and the wait never outlasts it. Answers served from the answer cache take no slot. Only the execution started by the first of the identical requests
+        waits for an admission slot, the requests joining it do not take one. The execution is cancelled
+        when every request waiting for it has timed out or gone away.
+
+        Args:
+            input_data: The input dictionary
+            admission: Admission control the pipeline execution goes through
+
+        Returns:
+            The agent's response as a dictionary, with `coalesced` set when the result was shared
+
+        Raises:
+            AdmissionRejectedError: When the pipeline execution was not admitted
+        """
+        deadline = Deadline(deadline_budget(input_data.pop("deadline_seconds", None)))
+        if await self.alookup_cached_answer(input_data):
+            admission = None
+        execute = partial(self._ainvoke_admitted, input_data, admission, deadline)
+        shared = False
+        try:
+            if config.knowledge.COALESCE_REQUESTS:
+                key = self._coalescing_key(input_data.get("messages", []))
+                result, shared = await self.single_flight.do(key, execute, timeout=deadline.remaining())
+            else:
+                result = await asyncio.wait_for(execute(), timeout=deadline.remaining())
+        except asyncio.TimeoutError:
+            logger.error(f"Request timed out after {deadline.budget_seconds:.2f}s")
+            return {"error": "timeout", "content": "The request timed out, please try again."}
+        return result | {"coalesced": True} if shared else result
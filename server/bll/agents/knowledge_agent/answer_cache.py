@@ -0,0 +1,187 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+import numpy as np
+from core.logger import logger
+
+
+class AnswerCache:
+    """
+    In-memory answer cache keyed on the contextualized prompt.
+
+    A lookup first tries an exact match on the normalized prompt, then compares the prompt
+    embedding with the embeddings of cached questions and returns the closest entry above
+    `similarity_threshold`. Entries expire after `ttl_seconds`, and the whole cache is dropped
+    when `version_fn` reports that the underlying knowledge collection changed. The thread polling
+    `version_fn` runs until `close`.
+    """
+
+    def __init__(
+        self,
+        embed_query: Callable[[str], list[float]],
+        aembed_query: Callable[[str], Awaitable[list[float]]],
+        max_size: int = 512,
+        ttl_seconds: float = 3600.0,
+        similarity_threshold: float = 0.95,
+        version_fn: Callable[[], Any] | None = None,
+        version_check_seconds: float = 60.0,
+    ):
+        """
+        Initialize the answer cache.
+
+        Args:
+            embed_query: Embeds a prompt, ideally backed by the retriever's embedding cache
+            aembed_query: Asynchronous counterpart of embed_query
+            max_size: Maximum number of cached answers
+            ttl_seconds: Lifetime of a cached answer
+            similarity_threshold: Minimum cosine similarity for a semantic hit
+            version_fn: Returns a fingerprint of the knowledge collection, the cache is cleared when it changes
+            version_check_seconds: How often version_fn is polled in the background
+        """
+        self.embed_query = embed_query
+        self.aembed_query = aembed_query
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.version_fn = version_fn
+        self.version_check_seconds = version_check_seconds
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+        self._entries: OrderedDict[str, tuple[float, np.ndarray, dict]] = OrderedDict()
+        self._index_keys: list[str] = []
+        self._index_matrix = np.empty((0, 0), dtype=np.float32)
+        self._lock = threading.Lock()
+        self._version = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        if version_fn is not None:
+            self._version = self._safe_version()
+            self._thread = threading.Thread(target=self._watch_version, name="answer-cache-version", daemon=True)
+            self._thread.start()
+
+    @staticmethod
+    def normalize(prompt: str) -> str:
+        return " ".join(prompt.split()).casefold()
+
+    def _safe_version(self) -> Any:
+        try:
+            return self.version_fn()
+        except Exception as e:
+            logger.warning(f"Failed to read knowledge collection version: {e}")
+            return self._version
+
+    def _watch_version(self) -> None:
+        while not self._stop.wait(self.version_check_seconds):
+            version = self._safe_version()
+            if version != self._version:
+                logger.info("Knowledge collection changed, clearing answer cache")
+                self._version = version
+                self.clear()
+
+    def _rebuild_index(self) -> None:
+        self._index_keys = list(self._entries)
+        if self._index_keys:
+            self._index_matrix = np.vstack([entry[1] for entry in self._entries.values()])
+        else:
+            self._index_matrix = np.empty((0, 0), dtype=np.float32)
+
+    @staticmethod
+    def _unit(vector: list[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        return array / (np.linalg.norm(array) or 1.0)
+
+    def _exact(self, key: str) -> tuple[dict, dict] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, _, result = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self._rebuild_index()
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return result, {"hit": True, "type": "exact", "age_s": round(time.monotonic() - stored_at, 1)}
+
+    def _semantic(self, vector: list[float]) -> tuple[dict, dict] | None:
+        with self._lock:
+            if not self._index_keys:
+                self.misses += 1
+                return None
+            similarities = self._index_matrix @ self._unit(vector)
+            now = time.monotonic()
+            for position in np.argsort(-similarities):
+                similarity = float(similarities[position])
+                if similarity < self.similarity_threshold:
+                    break
+                stored_at, _, result = self._entries[self._index_keys[position]]
+                if now - stored_at <= self.ttl_seconds:
+                    self.semantic_hits += 1
+                    return result, {
+                        "hit": True,
+                        "type": "semantic",
+                        "similarity": round(similarity, 4),
+                        "age_s": round(now - stored_at, 1),
+                    }
+            self.misses += 1
+            return None
+
+    def lookup(self, prompt: str) -> tuple[dict, dict] | None:
+        """
+        Look up a cached answer.
+
+        Returns:
+            The cached result and the cache metadata, or None on a miss
+        """
+        return self._exact(self.normalize(prompt)) or self._semantic(self.embed_query(prompt))
+
+    async def alookup(self, prompt: str) -> tuple[dict, dict] | None:
+        """Asynchronous counterpart of lookup."""
+        return self._exact(self.normalize(prompt)) or self._semantic(await self.aembed_query(prompt))
+
+    def store(self, prompt: str, result: dict) -> None:
+        """Cache a successful answer under the prompt."""
+        self._put(prompt, self.embed_query(prompt), result)
+
+    async def astore(self, prompt: str, result: dict) -> None:
+        """Asynchronous counterpart of store."""
+        self._put(prompt, await self.aembed_query(prompt), result)
+
+    def _put(self, prompt: str, embedding: list[float], result: dict) -> None:
+        vector = self._unit(embedding)
+        key = self.normalize(prompt)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), vector, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self._rebuild_index()
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Stop polling the collection version."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._rebuild_index()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.exact_hits + self.semantic_hits) / total if total else 0.0,
+            }
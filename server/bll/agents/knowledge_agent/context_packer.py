@@ -0,0 +1,170 @@
+import math
+import re
+from dataclasses import dataclass, field
+
+from langchain_core.documents import Document
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+@dataclass
+class ContextBlock:
+    """One section of the knowledge prompt, built from one or more chunks of the same page."""
+
+    source_type: str
+    documents: list[Document] = field(default_factory=list)
+    texts: list[str] = field(default_factory=list)
+    score: float = 0.0
+
+    @property
+    def metadata(self) -> dict:
+        return self.documents[0].metadata
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.texts)
+
+
+class ContextPacker:
+    """
+    Assembles retrieved documents into a context that fits a token budget.
+
+    Near-identical chunks of a page are dropped, and chunks that are contiguous in the source page
+    are merged into one block in reading order, overlapping text included once. Internal and web
+    scores are not comparable, so each source packs its blocks by score into its own share of the
+    budget, and what one source leaves unused goes to the other. Token counts are estimated from the
+    character length, which is close enough for Gemini and costs nothing.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 6000,
+        chars_per_token: float = 4.0,
+        duplicate_threshold: float = 0.9,
+        web_share: float = 0.3,
+        max_gap_chars: int = 32,
+    ):
+        """
+        Initialize the context packer.
+
+        Args:
+            token_budget: Maximum estimated tokens of document text in the prompt
+            chars_per_token: Average characters per token used by the estimate
+            duplicate_threshold: Word-set Jaccard similarity above which two chunks of a page are duplicates
+            web_share: Share of the token budget reserved for web results
+            max_gap_chars: Largest gap between two chunks, by `start_index`, that still counts as contiguous
+        """
+        self.token_budget = token_budget
+        self.chars_per_token = chars_per_token
+        self.duplicate_threshold = duplicate_threshold
+        self.web_share = web_share
+        self.max_gap_chars = max_gap_chars
+
+    def estimate_tokens(self, text: str) -> int:
+        return math.ceil(len(text) / self.chars_per_token)
+
+    @staticmethod
+    def _score(doc: Document) -> float:
+        return float(doc.metadata.get("score") or 0.0)
+
+    @staticmethod
+    def _position(doc: Document) -> tuple:
+        """Position of the chunk in its source, by splitter start index, else by insertion order of the _id."""
+        start = doc.metadata.get("start_index")
+        return (start is None, start or 0, str(doc.metadata.get("_id", "")))
+
+    def _is_duplicate(self, words: set[str], seen: list[set[str]]) -> bool:
+        for other in seen:
+            union = len(words | other)
+            if union and len(words & other) / union >= self.duplicate_threshold:
+                return True
+        return False
+
+    def _deduplicate(self, docs: list[Document], source_type: str) -> dict[tuple, list[Document]]:
+        """Group the chunks by source page, keeping the best scored of near-identical chunks."""
+        pages: dict[tuple, list[Document]] = {}
+        seen_words: dict[tuple, list[set[str]]] = {}
+        for doc in sorted(docs, key=self._score, reverse=True):
+            if source_type == "internal":
+                key = (doc.metadata.get("source"), doc.metadata.get("page_number"))
+            else:
+                key = (doc.metadata.get("source"),)
+            words = set(WORD_PATTERN.findall(doc.page_content.casefold()))
+            if self._is_duplicate(words, seen_words.setdefault(key, [])):
+                continue
+            seen_words[key].append(words)
+            pages.setdefault(key, []).append(doc)
+        return pages
+
+    def _group(self, docs: list[Document], source_type: str) -> list[ContextBlock]:
+        """Merge runs of contiguous chunks of the same source page into blocks, in reading order."""
+        blocks: list[ContextBlock] = []
+        for page_docs in self._deduplicate(docs, source_type).values():
+            block, end = None, None
+            for doc in sorted(page_docs, key=self._position):
+                start = doc.metadata.get("start_index")
+                if block is not None and start is not None and end is not None and start <= end + self.max_gap_chars:
+                    # Splitters overlap consecutive chunks, continue the passage with the text past its end
+                    separator = " " if start > end else ""
+                    block.texts[-1] += separator + doc.page_content[max(0, end - start) :]
+                    block.documents.append(doc)
+                    block.score = max(block.score, self._score(doc))
+                else:
+                    block = ContextBlock(
+                        source_type=source_type, documents=[doc], texts=[doc.page_content], score=self._score(doc)
+                    )
+                    blocks.append(block)
+                end = None if start is None else max(end or 0, start + len(doc.page_content))
+        for block in blocks:
+            block.texts = [text.strip() for text in block.texts]
+        blocks.sort(key=lambda block: block.score, reverse=True)
+        return blocks
+
+    def _fill(self, blocks: list[ContextBlock], budget: int, packed: list[ContextBlock]) -> tuple[list, int]:
+        """Pack blocks in order into the budget, returning the blocks left out and the tokens used."""
+        left_out, used_tokens = [], 0
+        for block in blocks:
+            tokens = self.estimate_tokens(block.text)
+            if used_tokens + tokens <= budget:
+                packed.append(block)
+                used_tokens += tokens
+            else:
+                left_out.append(block)
+        return left_out, used_tokens
+
+    def pack(self, db_docs: list[Document], web_docs: list[Document]) -> tuple[list[ContextBlock], dict]:
+        """
+        Select the blocks that go into the prompt.
+
+        Returns:
+            The packed blocks (internal first, then web, each by descending score) and packing statistics
+        """
+        internal = self._group(db_docs, "internal")
+        web = self._group(web_docs, "web")
+        web_budget = int(self.token_budget * self.web_share) if internal else self.token_budget
+        internal_budget = self.token_budget - web_budget if web else self.token_budget
+
+        packed: list[ContextBlock] = []
+        internal_left, internal_tokens = self._fill(internal, internal_budget, packed)
+        web_left, web_tokens = self._fill(web, web_budget, packed)
+        used_tokens = internal_tokens + web_tokens
+        if internal_left or web_left:
+            _, extra_tokens = self._fill(internal_left + web_left, self.token_budget - used_tokens, packed)
+            used_tokens += extra_tokens
+
+        if not packed and (internal or web):
+            # Never send an empty context because of a single oversized block, truncate it instead.
+            block = (internal or web)[0]
+            block.texts = [block.text[: int(self.token_budget * self.chars_per_token)]]
+            packed.append(block)
+            used_tokens = self.token_budget
+
+        packed.sort(key=lambda block: (block.source_type != "internal", -block.score))
+        stats = {
+            "input_chunks": len(db_docs) + len(web_docs),
+            "blocks": len(packed),
+            "dropped_blocks": len(internal) + len(web) - len(packed),
+            "estimated_tokens": used_tokens,
+            "token_budget": self.token_budget,
+        }
+        return packed, stats
@@ -1,13 +1,27 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Any, AsyncGenerator, AsyncIterator, Iterator
+
 from bll.agents.base_agent import BaseAgent
 from bll.agents.contextualizer_agent import ContextualizerAgent
+from bll.agents.history_agent import HistoryAgent
+from bll.agents.knowledge_agent.answer_cache import AnswerCache
+from bll.agents.knowledge_agent.context_packer import ContextBlock, ContextPacker
 from bll.agents.knowledge_agent.prompts import KNOWLEDGE_SYSTEM_PROMPT
+from core.config.config import config
 from core.interfaces import BaseRetriever
 from core.logger import logger
-from core.utils.public_document_helper import PublicDocumentHelper
+from core.utils.circuit_breaker import CircuitOpenError
+from core.utils.deadline import current_deadline
+from core.utils.metrics import ANSWER_LLM_TAG, stage_timer
+from core.utils.public_document_helper import get_public_document_helper
+from langchain_core.documents import Document
 from langchain_core.language_models import BaseLanguageModel
 from langchain_core.messages import AIMessage, HumanMessage
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+from langchain_core.runnables import Runnable, RunnableGenerator, RunnableLambda, RunnablePassthrough
 
 
 class KnowledgeAgent(BaseAgent):
@@ -26,6 +40,9 @@ class KnowledgeAgent(BaseAgent):
         web_max_k: int = 5,
         web_supplement_k: int = 2,
         additional_instructions: str = "",
+        speculative_web_search: bool = False,
+        answer_cache: AnswerCache | None = None,
+        context_packer: ContextPacker | None = None,
         verbose: bool = False,
     ):
         """
@@ -40,6 +57,9 @@ class KnowledgeAgent(BaseAgent):
             web_max_k: Maximum number of web search results to retrieve
             web_supplement_k: Number of web search results to use for supplementation
             additional_instructions: Custom instructions to include in the system prompt
+            speculative_web_search: Run the web search concurrently with the database retrieval
+            answer_cache: Optional cache answering repeated questions without retrieval and generation
+            context_packer: Optional packer deduplicating documents and fitting the context into a token budget
             verbose: Enable detailed logging
         """
         self.domain_context = domain_context
@@ -49,106 +69,287 @@ class KnowledgeAgent(BaseAgent):
         self.db_top_k = db_top_k
         self.web_max_k = web_max_k
         self.web_supplement_k = web_supplement_k
+        self.speculative_web_search = speculative_web_search
+        self.answer_cache = answer_cache
+        self.context_packer = context_packer
 
         self.db_docs_min_tolerance = 1
 
+        self.history_agent = HistoryAgent()
         self.contextualizer = ContextualizerAgent()
 
-        self.public_helper = PublicDocumentHelper()
+        self.public_helper = get_public_document_helper()
 
         super().__init__(llm, verbose)
 
     def _transform_input(self, input_dict: dict) -> dict:
-        messages: list[AIMessage | HumanMessage] = input_dict["messages"]
-        history = "\n".join(
-            [("User: " if isinstance(msg, HumanMessage) else "AI: ") + msg.content for msg in messages[:-1]]
-        )
-        del input_dict["messages"]
-        return input_dict | {
-            "prompt": messages[-1].content,
-            "history": history,
-            "domain_context": self.domain_context,
-            "additional_instructions": self.additional_instructions,
-        }
+        with stage_timer("transform"):
+            messages: list[AIMessage | HumanMessage] = input_dict["messages"]
+            return {key: value for key, value in input_dict.items() if key != "messages"} | {
+                "prompt": messages[-1].content,
+                "history_messages": messages[:-1],
+                "domain_context": self.domain_context,
+                "additional_instructions": self.additional_instructions,
+            }
+
+    @staticmethod
+    def _db_search_kwargs() -> dict:
+        """Retriever kwargs for the database search, fewer candidates when the deadline is tight."""
+        kwargs = {"auto_k": True}
+        deadline = current_deadline()
+        if deadline is None:
+            return kwargs
+        kwargs["timeout"] = deadline.share(config.deadline.VECTOR_SEARCH_SHARE)
+        if kwargs["timeout"] < config.deadline.VECTOR_SEARCH_FULL_SECONDS:
+            deadline.degrade("vector_search_reduced")
+            kwargs["candidate_limit"] = config.deadline.REDUCED_CANDIDATE_LIMIT
+        return kwargs
+
+    @staticmethod
+    def _db_search_timed_out() -> list[Document]:
+        logger.warning("Vector search exceeded its deadline share")
+        current_deadline().degrade("vector_search_timeout")
+        return []
 
     def _retrieve_db_docs(self, input_dict: dict) -> dict:
         """Retrieve documents from the database."""
         query = input_dict["contextual_prompt"]
-        docs = self.db_retriever.retrieve(
-            query=query,
-            k=self.db_top_k,
-            auto_k=True,
-        )
+        start = time.perf_counter()
+        try:
+            docs = self.db_retriever.retrieve(
+                query=query,
+                k=self.db_top_k,
+                **self._db_search_kwargs(),
+            )
+        except TimeoutError:
+            docs = self._db_search_timed_out()
         logger.debug(f"Retrieved {len(docs)} docs from database")
-        return input_dict | {"db_docs": docs}
+        return input_dict | {
+            "db_docs": docs,
+            "retrieval_timings": self._retrieval_timings(input_dict, db_ms=self._elapsed_ms(start)),
+        }
 
-    def _conditional_web_search(self, input_dict: dict) -> dict:
-        """Conditionally perform web search based on relevance and configuration."""
-        web_docs = []
+    async def _aretrieve_db_docs(self, input_dict: dict) -> dict:
+        """Retrieve documents from the database without blocking the event loop."""
+        query = input_dict["contextual_prompt"]
+        start = time.perf_counter()
+        try:
+            docs = await self.db_retriever.aretrieve(
+                query=query,
+                k=self.db_top_k,
+                **self._db_search_kwargs(),
+            )
+        except TimeoutError:
+            docs = self._db_search_timed_out()
+        logger.debug(f"Retrieved {len(docs)} docs from database")
+        return input_dict | {
+            "db_docs": docs,
+            "retrieval_timings": self._retrieval_timings(input_dict, db_ms=self._elapsed_ms(start)),
+        }
 
-        if self.web_search_retriever:
-            query = input_dict["contextual_prompt"]
-            db_docs = input_dict["db_docs"]
+    @staticmethod
+    def _elapsed_ms(start: float) -> float:
+        return round((time.perf_counter() - start) * 1000, 2)
 
-            if len(db_docs) >= self.db_docs_min_tolerance:
-                web_k = min(self.web_supplement_k, self.web_max_k)
-            else:
-                web_k = self.web_max_k
-                logger.debug(f"DB docs not relevant, using {web_k} web results")
+    def _retrieval_timings(self, input_dict: dict, **timings: float) -> dict:
+        mode = "speculative" if self.speculative_web_search else "sequential"
+        return {"mode": mode} | input_dict.get("retrieval_timings", {}) | timings
 
-            # Truncate query for web search to avoid API limits (Tavily has 400 char limit)
-            web_query = query[:400] if len(query) > 400 else query
-            if len(query) > 400:
-                logger.debug(f"Truncated web search query from {len(query)} to {len(web_query)} characters")
+    def _web_k(self, db_docs: list[Document]) -> int:
+        """Number of web results to use given the database results."""
+        if len(db_docs) >= self.db_docs_min_tolerance:
+            return min(self.web_supplement_k, self.web_max_k)
+        logger.debug(f"DB docs not relevant, using {self.web_max_k} web results")
+        return self.web_max_k
 
-            web_docs = self.web_search_retriever.retrieve(web_query, k=web_k)
-            logger.debug(f"Retrieved {len(web_docs)} web docs")
+    @staticmethod
+    def _web_query(query: str) -> str:
+        # Truncate query for web search to avoid API limits (Tavily has 400 char limit)
+        if len(query) > 400:
+            logger.debug(f"Truncated web search query from {len(query)} to 400 characters")
+            return query[:400]
+        return query
 
+    @staticmethod
+    def _log_web_docs(web_docs: list[Document]) -> None:
         logger.debug(
             f"Tavily retrieved docs: {[str(doc.metadata['source']) + ' : ' + str(doc.metadata['score']) for doc in web_docs]}"
         )
-        return input_dict | {"web_docs": web_docs}
 
-    def _merge_context(self, input_dict: dict) -> dict:
-        """Merge all retrieved documents into a single context and extract references."""
-        db_docs = input_dict.get("db_docs", [])
-        web_docs = input_dict.get("web_docs", [])
+    @staticmethod
+    def _web_timeout() -> float | None:
+        """Sub-budget of the web search, 0 when the deadline leaves no room for it."""
+        deadline = current_deadline()
+        if deadline is None:
+            return None
+        timeout = deadline.share(config.deadline.WEB_SEARCH_SHARE)
+        if timeout < config.deadline.WEB_SEARCH_MIN_SECONDS:
+            deadline.degrade("web_search_dropped")
+            return 0.0
+        return timeout
 
-        all_docs = []
+    @staticmethod
+    def _web_search_timed_out() -> list[Document]:
+        logger.warning("Web search exceeded its deadline share")
+        current_deadline().degrade("web_search_timeout")
+        return []
 
-        for doc in db_docs:
-            doc.metadata = doc.metadata or {}
-            doc.metadata["type"] = "internal"
-            all_docs.append(doc)
+    @staticmethod
+    def _web_search_unavailable() -> list[Document]:
+        logger.debug("Web search skipped, its circuit breaker is open")
+        deadline = current_deadline()
+        if deadline is not None:
+            deadline.degrade("web_search_circuit_open")
+        return []
 
-        for doc in web_docs:
-            doc.metadata = doc.metadata or {}
-            doc.metadata["type"] = "web"
-            all_docs.append(doc)
+    def _search_web(self, query: str, k: int) -> list[Document]:
+        if not self.web_search_retriever:
+            return []
+        timeout = self._web_timeout()
+        if timeout == 0.0:
+            return []
+        kwargs = {} if timeout is None else {"timeout": timeout}
+        with stage_timer("web_search"):
+            try:
+                web_docs = self.web_search_retriever.retrieve(self._web_query(query), k=k, **kwargs)
+            except TimeoutError:
+                web_docs = self._web_search_timed_out()
+            except CircuitOpenError:
+                web_docs = self._web_search_unavailable()
+        logger.debug(f"Retrieved {len(web_docs)} web docs")
+        return web_docs
 
-        context_parts = []
-        for doc in all_docs:
-            source_type: str = doc.metadata["type"]
-            source_info: str = str(doc.metadata.get("source"))
+    async def _asearch_web(self, query: str, k: int) -> list[Document]:
+        if not self.web_search_retriever:
+            return []
+        timeout = self._web_timeout()
+        if timeout == 0.0:
+            return []
+        kwargs = {} if timeout is None else {"timeout": timeout}
+        with stage_timer("web_search"):
+            try:
+                web_docs = await asyncio.wait_for(
+                    self.web_search_retriever.aretrieve(self._web_query(query), k=k, **kwargs), timeout
+                )
+            except TimeoutError:
+                web_docs = self._web_search_timed_out()
+            except CircuitOpenError:
+                web_docs = self._web_search_unavailable()
+        logger.debug(f"Retrieved {len(web_docs)} web docs")
+        return web_docs
 
-            if source_type == "internal":
-                public_url = self.public_helper.extract_public_url_from_document(doc)
-                if public_url:
-                    page_number = doc.metadata.get("page_number", 1)
-                    page_info = f"#page={page_number}"
-                    full_url = f"{public_url}#page={page_number}"
-                    source_info = f"[{source_info}{page_info}]({full_url})"
-                else:
-                    source_info += f"#page={doc.metadata.get('page_number', 1)}"
+    def _conditional_web_search(self, input_dict: dict) -> dict:
+        """Conditionally perform web search based on relevance and configuration."""
+        start = time.perf_counter()
+        web_docs = []
+        if self.web_search_retriever:
+            web_docs = self._search_web(input_dict["contextual_prompt"], self._web_k(input_dict["db_docs"]))
 
-            context_parts.append(f"[{source_type.upper()}]\n{doc.page_content}\nReference: {source_info}")
+        self._log_web_docs(web_docs)
+        return input_dict | {
+            "web_docs": web_docs,
+            "retrieval_timings": self._retrieval_timings(input_dict, web_ms=self._elapsed_ms(start)),
+        }
 
-        merged_context: str = "\n\n---\n\n".join(context_parts)
+    async def _aconditional_web_search(self, input_dict: dict) -> dict:
+        """Asynchronous counterpart of _conditional_web_search."""
+        start = time.perf_counter()
+        web_docs = []
+        if self.web_search_retriever:
+            web_docs = await self._asearch_web(input_dict["contextual_prompt"], self._web_k(input_dict["db_docs"]))
 
+        self._log_web_docs(web_docs)
         return input_dict | {
-            "context": merged_context,
+            "web_docs": web_docs,
+            "retrieval_timings": self._retrieval_timings(input_dict, web_ms=self._elapsed_ms(start)),
+        }
+
+    def _timed_web_search(self, query: str) -> tuple[list[Document], float]:
+        start = time.perf_counter()
+        return self._search_web(query, self.web_max_k), self._elapsed_ms(start)
+
+    async def _atimed_web_search(self, query: str) -> tuple[list[Document], float]:
+        start = time.perf_counter()
+        return await self._asearch_web(query, self.web_max_k), self._elapsed_ms(start)
+
+    def _speculative_retrieve(self, input_dict: dict) -> dict:
+        """
+        Run the database and the web search concurrently.
+
+        The web search is started with web_max_k and trimmed to the supplement count once
+        the database results are known, so retrieval takes max(db, web) instead of db + web.
+        """
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            web_future = executor.submit(copy_context().run, self._timed_web_search, input_dict["contextual_prompt"])
+            db_result = self._retrieve_db_docs(input_dict)
+            web_docs, web_ms = web_future.result()
+        return self._trim_speculative_result(db_result, web_docs, web_ms, start)
+
+    async def _aspeculative_retrieve(self, input_dict: dict) -> dict:
+        """Asynchronous counterpart of _speculative_retrieve."""
+        start = time.perf_counter()
+        db_result, (web_docs, web_ms) = await asyncio.gather(
+            self._aretrieve_db_docs(input_dict),
+            self._atimed_web_search(input_dict["contextual_prompt"]),
+        )
+        return self._trim_speculative_result(db_result, web_docs, web_ms, start)
+
+    def _trim_speculative_result(self, db_result: dict, web_docs: list[Document], web_ms: float, start: float) -> dict:
+        web_docs = web_docs[: self._web_k(db_result["db_docs"])]
+        self._log_web_docs(web_docs)
+        return db_result | {
+            "web_docs": web_docs,
+            "retrieval_timings": self._retrieval_timings(db_result, web_ms=web_ms, total_ms=self._elapsed_ms(start)),
         }
 
+    @staticmethod
+    def _tagged(doc: Document, source_type: str) -> Document:
+        return doc.model_copy(update={"metadata": (doc.metadata or {}) | {"type": source_type}})
+
+    def _merge_context(self, input_dict: dict) -> dict:
+        """Merge all retrieved documents into a single context and extract references."""
+        with stage_timer("merge"):
+            # Tag copies, the retrieved documents may be shared with caches and the recorded trace
+            db_docs = [self._tagged(doc, "internal") for doc in input_dict.get("db_docs", [])]
+            web_docs = [self._tagged(doc, "web") for doc in input_dict.get("web_docs", [])]
+
+            packing = {}
+            if self.context_packer is None:
+                blocks = [
+                    ContextBlock(doc.metadata["type"], [doc], [doc.page_content]) for doc in [*db_docs, *web_docs]
+                ]
+            else:
+                blocks, packing = self.context_packer.pack(db_docs, web_docs)
+                db_docs = [doc for block in blocks if block.source_type == "internal" for doc in block.documents]
+                web_docs = [doc for block in blocks if block.source_type == "web" for doc in block.documents]
+                logger.debug(f"Packed context: {packing}")
+
+            context_parts = []
+            for block in blocks:
+                source_info: str = str(block.metadata.get("source"))
+
+                if block.source_type == "internal":
+                    public_url = self.public_helper.extract_public_url_from_document(block.documents[0])
+                    if public_url:
+                        page_number = block.metadata.get("page_number", 1)
+                        page_info = f"#page={page_number}"
+                        full_url = f"{public_url}#page={page_number}"
+                        source_info = f"[{source_info}{page_info}]({full_url})"
+                    else:
+                        source_info += f"#page={block.metadata.get('page_number', 1)}"
+
+                context_parts.append(f"[{block.source_type.upper()}]\n{block.text}\nReference: {source_info}")
+
+            merged_context: str = "\n\n---\n\n".join(context_parts)
+
+            return input_dict | {
+                "context": merged_context,
+                "db_docs": db_docs,
+                "web_docs": web_docs,
+                "context_packing": packing,
+            }
+
     def _extract_references(self, input_dict: dict) -> list[str]:
         """Extract references from documents in the state."""
         references = []
@@ -167,6 +368,78 @@ class KnowledgeAgent(BaseAgent):
 
         return references
 
+    async def astream_answer(self, input_data: dict[str, Any]) -> AsyncGenerator[dict[str, Any], None]:
+        """
+        Stream the answer as events.
+
+        Yields a `context` event with the references and retrieval metadata as soon as retrieval
+        is done, a `token` event per LLM chunk and a terminal `done` event with the full answer
+        and metadata. Failures are reported as a single `error` event.
+        """
+        metadata: dict[str, Any] = {}
+        answer_parts: list[str] = []
+        context_sent = False
+
+        async for chunk in self.astream(input_data):
+            if "error" in chunk:
+                yield {"event": "error", "data": chunk}
+                return
+
+            token = chunk.pop("answer", None)
+            metadata |= chunk
+            if not context_sent and "context" in metadata:
+                context_sent = True
+                yield {
+                    "event": "context",
+                    "data": {
+                        "references": self._extract_references(metadata),
+                        "contextual_prompt": metadata.get("contextual_prompt", ""),
+                        "retrieval_timings": metadata.get("retrieval_timings", {}),
+                    },
+                }
+            if token:
+                answer_parts.append(token)
+                yield {"event": "token", "data": token}
+
+        yield {"event": "done", "data": metadata | {"answer": "".join(answer_parts)}}
+
+    async def awarm_up(self, probe_query: str, warm_llm: bool = True) -> dict[str, str]:
+        """
+        Send a probe through the expensive clients concurrently, so their connections and lazy state exist
+        before the first request.
+
+        Args:
+            probe_query: Query embedded and searched in the knowledge collection
+            warm_llm: Also run a one-token LLM generation
+
+        Returns:
+            The outcome of each step, "ok" or the error message
+        """
+        steps = {
+            "vector_search": self.db_retriever.aretrieve(probe_query, k=1),
+            "public_manifest": asyncio.to_thread(self.public_helper.refresh_manifest),
+        }
+        if self.web_search_retriever:
+            steps["web_search"] = self.web_search_retriever.awarm_up()
+        if warm_llm:
+            steps["llm"] = self.llm.bind(max_output_tokens=1).ainvoke(probe_query)
+
+        results = await asyncio.gather(*steps.values(), return_exceptions=True)
+        return {
+            name: f"{type(result).__name__}: {result}" if isinstance(result, BaseException) else "ok"
+            for name, result in zip(steps, results, strict=True)
+        }
+
+    async def aprime_embeddings(self, conversations: list[list[AIMessage | HumanMessage]]) -> None:
+        """
+        Embed the questions of a batch with one call before the batch is answered.
+
+        Only first-turn questions are primed, their contextual prompt is the question itself.
+        """
+        prompts = [str(messages[-1].content) for messages in conversations if len(messages) == 1]
+        if prompts:
+            await self.db_retriever.aprime_query_embeddings(prompts)
+
     def _format_prompt_input(self, input_dict: dict) -> dict:
         """Format the input for the KNOWLEDGE_SYSTEM_PROMPT."""
         return {
@@ -177,18 +450,123 @@ class KnowledgeAgent(BaseAgent):
             "contextual_prompt": input_dict.get("contextual_prompt", ""),
         }
 
-    def _build_chain(self):
-        chain = (
-            RunnableLambda(self._transform_input)
-            | RunnableLambda(lambda input: self.contextualizer.chain.invoke(input))
-            | RunnableLambda(self._retrieve_db_docs)
-            | RunnableLambda(self._conditional_web_search)
+    def _answer_llm(self, _prompt) -> Runnable:
+        """The answer LLM, with max tokens capped to what the remaining deadline can generate."""
+        deadline = current_deadline()
+        if deadline is None:
+            return self.llm.with_config(tags=[ANSWER_LLM_TAG])
+
+        max_tokens = max(
+            int(deadline.remaining() * config.deadline.LLM_TOKENS_PER_SECOND), config.deadline.LLM_MIN_TOKENS
+        )
+        default_max_tokens = getattr(self.llm, "max_tokens", None)
+        if default_max_tokens is not None and max_tokens >= default_max_tokens:
+            return self.llm.with_config(tags=[ANSWER_LLM_TAG])
+
+        deadline.degrade("llm_max_tokens_capped")
+        return self.llm.bind(max_output_tokens=max_tokens).with_config(tags=[ANSWER_LLM_TAG])
+
+    def _build_retrieval(self):
+        if self.speculative_web_search:
+            return RunnableLambda(self._speculative_retrieve, afunc=self._aspeculative_retrieve)
+        return RunnableLambda(self._retrieve_db_docs, afunc=self._aretrieve_db_docs) | RunnableLambda(
+            self._conditional_web_search, afunc=self._aconditional_web_search
+        )
+
+    async def alookup_cached_answer(self, input_data: dict[str, Any]) -> bool:
+        """
+        Look up the answer of a request without history before it is admitted.
+
+        Without history the contextual prompt is the prompt itself, so no LLM call is needed to find the
+        cache entry. The outcome is handed to the chain in `cached_answer`, which then does not look it up again.
+
+        Returns:
+            Whether the answer is cached, the request then needs no admission slot
+        """
+        messages = input_data.get("messages", [])
+        if self.answer_cache is None or len(messages) != 1:
+            return False
+        input_data["cached_answer"] = await self.answer_cache.alookup(str(messages[-1].content))
+        return input_data["cached_answer"] is not None
+
+    def _mark_cache_miss(self, input_dict: dict) -> dict:
+        return {key: value for key, value in input_dict.items() if key != "cached_answer"} | {"cache": {"hit": False}}
+
+    def _cached_answer(self, input_dict: dict, cached: tuple[dict, dict] | None):
+        """Return the answer chain on a miss, or a runnable replaying the cached result on a hit."""
+        if cached is None:
+            return self._answer_chain
+        result, cache_metadata = cached
+        logger.debug(f"Answer cache hit: {cache_metadata}")
+        replay = {key: value for key, value in result.items() if key != "retrieval_timings"} | {
+            "prompt": input_dict["prompt"],
+            "history": input_dict["history"],
+            "history_summary": input_dict["history_summary"],
+            "contextual_prompt": input_dict["contextual_prompt"],
+            "cache": cache_metadata,
+        }
+        return RunnableLambda(lambda _: replay)
+
+    def _route_answer(self, input_dict: dict):
+        if "cached_answer" in input_dict:
+            return self._cached_answer(input_dict, input_dict["cached_answer"])
+        return self._cached_answer(input_dict, self.answer_cache.lookup(input_dict["contextual_prompt"]))
+
+    async def _aroute_answer(self, input_dict: dict):
+        if "cached_answer" in input_dict:
+            return self._cached_answer(input_dict, input_dict["cached_answer"])
+        return self._cached_answer(input_dict, await self.answer_cache.alookup(input_dict["contextual_prompt"]))
+
+    @staticmethod
+    def _accumulate(result: dict, chunk: dict) -> dict:
+        if "answer" in chunk:
+            return result | chunk | {"answer": result.get("answer", "") + chunk["answer"]}
+        return result | chunk
+
+    @staticmethod
+    def _cacheable(result: dict) -> bool:
+        """Only complete answers produced without deadline degradations are cached."""
+        deadline = current_deadline()
+        return bool(result.get("answer")) and (deadline is None or not deadline.degradations)
+
+    def _store_answer(self, chunks: Iterator[dict]) -> Iterator[dict]:
+        """Pass chunks through unchanged and cache the completed answer."""
+        result: dict = {}
+        for chunk in chunks:
+            result = self._accumulate(result, chunk)
+            yield chunk
+        if self._cacheable(result):
+            self.answer_cache.store(result["contextual_prompt"], result)
+
+    async def _astore_answer(self, chunks: AsyncIterator[dict]) -> AsyncIterator[dict]:
+        """Asynchronous counterpart of _store_answer."""
+        result: dict = {}
+        async for chunk in chunks:
+            result = self._accumulate(result, chunk)
+            yield chunk
+        if self._cacheable(result):
+            await self.answer_cache.astore(result["contextual_prompt"], result)
+
+    def _build_answer_chain(self):
+        return (
+            self._build_retrieval()
             | RunnableLambda(self._merge_context)
             | RunnablePassthrough.assign(
                 answer=RunnableLambda(self._format_prompt_input)
                 | KNOWLEDGE_SYSTEM_PROMPT
-                | self.llm
+                | RunnableLambda(self._answer_llm)
                 | StrOutputParser(),
             )
         )
-        return chain
+
+    def _build_chain(self):
+        chain = RunnableLambda(self._transform_input) | self.history_agent.chain | self.contextualizer.chain
+        if self.answer_cache is None:
+            return chain | self._build_answer_chain()
+
+        self._answer_chain = (
+            RunnableLambda(self._mark_cache_miss)
+            | self._build_answer_chain()
+            | RunnableGenerator(self._store_answer, self._astore_answer)
+        )
+        return chain | RunnableLambda(self._route_answer, afunc=self._aroute_answer)
@@ -1,9 +1,9 @@
 import os
 from enum import StrEnum
+from functools import cached_property
 
 from core.utils.gcp_secret import get_secret
 from dotenv import load_dotenv
-from langfuse.langchain import CallbackHandler
 
 load_dotenv()
 
@@ -19,21 +19,180 @@ class ENVIRONMENT(StrEnum):
 
 
 class MongoConfig:
-    URI: str = get_secret("MONGO_URI")
     DB_NAME: str = "assistant"
     COLLECTION_NAME: str = "knowledge"
     VECTOR_SRACH_INDEX_NAME: str = "embedding"
     RELEVANCE_SCORE_FN: str = "cosine"
+    ASYNC_MAX_POOL_SIZE: int = 100
+    ASYNC_MIN_POOL_SIZE: int = 10
+    ASYNC_WAIT_QUEUE_TIMEOUT_MS: int = 2000
+    EMBEDDING_CACHE_SIZE: int = 1024
+    EMBEDDING_CACHE_TTL_SECONDS: float = 3600.0
+    AUTO_K_CANDIDATE_LIMIT: int = 100
+    AUTO_K_OVERSAMPLING_FACTOR: int = 10
+    CUTOFF_STRATEGY: str = "normalized_threshold"
+    CUTOFF_MIN_K: int = 3
+    CUTOFF_MAX_K: int = 15
+    CUTOFF_NORMALIZED_THRESHOLD: float = 0.90
+    CUTOFF_ABSOLUTE_THRESHOLD: float = 0.75
+    CUTOFF_FIXED_K: int = 6
+    LOCAL_INDEX_ENABLED: bool = False
+    LOCAL_INDEX_REFRESH_SECONDS: float = 60.0
+    LOCAL_INDEX_USE_CHANGE_STREAM: bool = True
+
+    @property
+    def URI(self) -> str:
+        return get_secret("MONGO_URI")
 
 
 class GCPConfig:
     BUCKET_NAME: str = "ai-assistant-dev-docs"
     PUBLIC_BUCKET_NAME: str = "ai-assistant-public-docs"
     PREFIX: str = ""
+    PUBLIC_MANIFEST_TTL_SECONDS: float = 600.0
+    PUBLIC_MANIFEST_RETRY_SECONDS: float = 60.0
 
 
 class Tavily:
-    API_KEY = get_secret("TAVILY_API_KEY")
+    CACHE_ENABLED: bool = True
+    CACHE_SIZE: int = 1024
+    # University pages change about weekly, stale results are served for a while longer and refreshed
+    CACHE_TTL_SECONDS: float = 24 * 3600.0
+    CACHE_STALE_SECONDS: float = 6 * 24 * 3600.0
+    # SQLite file of the on-disk cache, unset keeps the cache in memory only
+    CACHE_PATH: str | None = os.getenv("TAVILY_CACHE_PATH")
+    BASE_URL: str = "https://api.tavily.com"
+    TIMEOUT_SECONDS: float = 5.0
+    MAX_CONNECTIONS: int = 20
+    KEEPALIVE_EXPIRY_SECONDS: float = 60.0
+    # A hedged request is sent once a search is slower than this quantile of the recent searches
+    HEDGE_QUANTILE: float | None = 0.95
+    HEDGE_WINDOW: int = 200
+    HEDGE_MIN_SAMPLES: int = 20
+    HEDGE_MIN_DELAY_SECONDS: float = 0.5
+    BREAKER_FAILURE_THRESHOLD: int = 5
+    BREAKER_SLOW_CALL_SECONDS: float = 4.0
+    BREAKER_COOL_DOWN_SECONDS: float = 30.0
+
+    @property
+    def API_KEY(self) -> str:
+        return get_secret("TAVILY_API_KEY")
+
+
+class ContextualizerConfig:
+    SKIP_SELF_CONTAINED: bool = True
+    MIN_SELF_CONTAINED_WORDS: int = 4
+    DOMAIN_TERMS: tuple[str, ...] = (
+        "neptun", "obuda", "óbuda", "uni", "egyetem", "university", "semester", "félév", "exam", "vizsg",
+        "enrol", "beiratkoz", "regist", "tuition", "tandíj", "fee", "díj", "deadline", "határidő", "dormitor",
+        "kollégium", "scholarship", "ösztöndíj", "student", "hallgató", "diák", "card", "igazolvány", "course",
+        "kurzus", "tárgy", "thesis", "szakdolgozat", "diploma", "credit", "kredit", "faculty", "kar",
+    )  # fmt: skip
+    CACHE_SIZE: int = 2048
+    CACHE_TTL_SECONDS: float = 3600.0
+
+
+class HistoryConfig:
+    WINDOW_TURNS: int = 3
+    SUMMARY_REFRESH_TURNS: int = 2
+    SUMMARY_MAX_WORDS: int = 150
+    MESSAGE_MAX_CHARS: int = 1500
+    CACHE_SIZE: int = 2048
+    CACHE_TTL_SECONDS: float = 3600.0
+
+
+class KnowledgeConfig:
+    SPECULATIVE_WEB_SEARCH: bool = True
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_SIZE: int = 512
+    ANSWER_CACHE_TTL_SECONDS: float = 6 * 3600.0
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = 0.95
+    ANSWER_CACHE_VERSION_CHECK_SECONDS: float = 60.0
+    CONTEXT_TOKEN_BUDGET: int = 6000
+    CONTEXT_CHARS_PER_TOKEN: float = 4.0
+    CONTEXT_DUPLICATE_THRESHOLD: float = 0.9
+    # Atlas and Tavily scores are on different scales, so web results get their own share of the budget
+    CONTEXT_WEB_SHARE: float = 0.3
+    COALESCE_REQUESTS: bool = True
+
+
+class MetricsConfig:
+    INCLUDE_TIMINGS: bool = True
+
+
+class DeadlineConfig:
+    DEFAULT_BUDGET_SECONDS: float = 30.0
+    MAX_BUDGET_SECONDS: float = 120.0
+    HEADER: str = "X-Request-Timeout"
+    CONTEXTUALIZE_SHARE: float = 0.15
+    CONTEXTUALIZE_MIN_SECONDS: float = 0.5
+    SUMMARIZE_SHARE: float = 0.15
+    SUMMARIZE_MIN_SECONDS: float = 0.5
+    VECTOR_SEARCH_SHARE: float = 0.15
+    VECTOR_SEARCH_FULL_SECONDS: float = 1.0
+    REDUCED_CANDIDATE_LIMIT: int = 30
+    WEB_SEARCH_SHARE: float = 0.3
+    WEB_SEARCH_MIN_SECONDS: float = 1.5
+    LLM_TOKENS_PER_SECOND: float = 80.0
+    LLM_MIN_TOKENS: int = 256
+
+
+class ConversationConfig:
+    ENABLED: bool = True
+    COLLECTION_NAME: str = "conversations"
+    CACHE_SIZE: int = 2048
+    CACHE_TTL_SECONDS: float = 1800.0
+    MAX_MESSAGES: int = 200
+
+
+class WarmupConfig:
+    ENABLED: bool = True
+    PROBE_QUERY: str = "What is the deadline for paying the tuition fee?"
+    WARM_LLM: bool = True
+    TIMEOUT_SECONDS: float = 30.0
+    RETRY_SECONDS: float = 10.0
+    # The pipeline degrades without these, their failure does not keep the instance out of rotation
+    OPTIONAL_STEPS: tuple[str, ...] = ("public_manifest", "web_search")
+
+
+class BatchConfig:
+    MAX_ITEMS: int = 500
+    CONCURRENCY: int = 8
+
+
+class AdmissionConfig:
+    MAX_CONCURRENT_REQUESTS: int = 16
+    MAX_QUEUED_REQUESTS: int = 64
+    QUEUE_TIMEOUT_SECONDS: float = 10.0
+    RETRY_AFTER_SECONDS: int = 5
+
+
+class TracingConfig:
+    ENABLED: bool = True
+    SAMPLE_RATE: float = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+    ALWAYS_TRACE_ERRORS: bool = True
+    FORCE_HEADER: str = "X-Force-Trace"
+    BUFFER_SIZE: int = 1000
+    EXPORT_BATCH_SIZE: int = 50
+
+
+class MockConfig:
+    LLM_LATENCY_SECONDS: float = 0.3
+    LLM_TOKENS_PER_SECOND: float = 100.0
+    LLM_OUTPUT_TOKENS: int = 120
+    EMBEDDING_LATENCY_SECONDS: float = 0.05
+    EMBEDDING_DIMENSIONS: int = 768
+
+
+class ServerConfig:
+    HOST: str = os.getenv("HOST", "0.0.0.0")
+    PORT: int = int(os.getenv("PORT", "8081"))
+    # 0 means one worker per available core
+    WORKERS: int = int(os.getenv("WEB_CONCURRENCY", "0"))
+    # Longer than the idle timeout of the load balancer in front, so it never reuses a connection we closed
+    KEEP_ALIVE_SECONDS: int = 75
+    BACKLOG: int = 2048
+    GRACEFUL_SHUTDOWN_SECONDS: int = 30
 
 
 class Config:
@@ -42,8 +201,26 @@ class Config:
     llm: str = "gemini-2.0-flash-001"
     embedding: str = "gemini-embedding-001"
     tavily: Tavily = Tavily()
-    environment: ENVIRONMENT = ENVIRONMENT.LOCAL
-    langfuse_handler = CallbackHandler(update_trace=True)
+    contextualizer: ContextualizerConfig = ContextualizerConfig()
+    history: HistoryConfig = HistoryConfig()
+    knowledge: KnowledgeConfig = KnowledgeConfig()
+    metrics: MetricsConfig = MetricsConfig()
+    admission: AdmissionConfig = AdmissionConfig()
+    deadline: DeadlineConfig = DeadlineConfig()
+    conversation: ConversationConfig = ConversationConfig()
+    batch: BatchConfig = BatchConfig()
+    warmup: WarmupConfig = WarmupConfig()
+    server: ServerConfig = ServerConfig()
+    tracing: TracingConfig = TracingConfig()
+    mock: MockConfig = MockConfig()
+    environment: ENVIRONMENT = ENVIRONMENT(os.getenv("ENVIRONMENT", ENVIRONMENT.LOCAL))
+    secrets: tuple[str, ...] = ("MONGO_URI", "TAVILY_API_KEY")
+
+    @cached_property
+    def langfuse_handler(self):
+        from langfuse.langchain import CallbackHandler
+
+        return CallbackHandler(update_trace=True)
 
 
 config = Config()
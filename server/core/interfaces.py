@@ -1,6 +1,7 @@
+import asyncio
 from typing import Protocol
 
-from langchain.schema import Document
+from langchain_core.documents import Document
 
 
 class BaseRetriever(Protocol):
@@ -19,3 +20,45 @@ class BaseRetriever(Protocol):
             **kwargs: Additional retriever-specific parameters
         """
         ...
+
+    async def aretrieve(
+        self,
+        query: str,
+        k: int = 5,
+        **kwargs,
+    ) -> list[Document]:
+        """
+        Asynchronously retrieve documents.
+
+        Defaults to running `retrieve` in a worker thread, retrievers with a native
+        async client should override it.
+
+        Args:
+            query: Search query
+            k: Maximum number of documents to return
+            **kwargs: Additional retriever-specific parameters
+        """
+        return await asyncio.to_thread(self.retrieve, query, k, **kwargs)
+
+    async def aprime_query_embeddings(self, queries: list[str]) -> None:
+        """
+        Embed queries ahead of retrieval with one batched call, so the later retrievals skip the embedding.
+
+        Defaults to doing nothing, retrievers with a query embedding cache should override it.
+
+        Args:
+            queries: Queries that are about to be retrieved
+        """
+        return None
+
+    async def awarm_up(self) -> None:
+        """
+        Open the connections of the retriever before the first request.
+
+        Defaults to doing nothing, retrievers with a remote client should override it.
+        """
+        return None
+
+    async def aclose(self) -> None:
+        """Close the clients of the retriever, defaults to doing nothing."""
+        return None
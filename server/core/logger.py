@@ -1,9 +1,19 @@
+import atexit
 import logging
+import os
+import queue
 from logging.config import dictConfig
+from logging.handlers import QueueHandler, QueueListener
 
 from core.config.config import ENVIRONMENT, config
 
-debug_level_env = [ENVIRONMENT.GITHUB, ENVIRONMENT.LOCAL]
+LOG_LEVELS = {
+    ENVIRONMENT.LOCAL: "DEBUG",
+    ENVIRONMENT.GITHUB: "DEBUG",
+    ENVIRONMENT.DEVELOPMENT: "INFO",
+    ENVIRONMENT.PRODUCTION: "INFO",
+}
+LOG_LEVEL = os.getenv("LOG_LEVEL", LOG_LEVELS[config.environment]).upper()
 
 LOGGING_CONFIG = {
     "version": 1,
@@ -18,14 +28,14 @@ LOGGING_CONFIG = {
         "console": {
             "class": "logging.StreamHandler",
             "formatter": "default",
-            "level": "DEBUG" if config.environment in debug_level_env else "INFO",
+            "level": LOG_LEVEL,
             "stream": "ext://sys.stdout",
         },
         "file": {
             "class": "logging.FileHandler",
             "formatter": "json",
             "filename": "app.log",
-            "level": "DEBUG" if config.environment in debug_level_env else "INFO",
+            "level": LOG_LEVEL,
             "encoding": "utf-8",
         },
     },
@@ -37,7 +47,7 @@ LOGGING_CONFIG = {
         },
         "app": {
             "handlers": ["console", "file"],
-            "level": "DEBUG",
+            "level": LOG_LEVEL,
             "propagate": False,
         },
     },
@@ -47,3 +57,10 @@ LOGGING_CONFIG = {
 dictConfig(LOGGING_CONFIG)
 
 logger = logging.getLogger("app")
+
+# The request path only enqueues records, the stdout and file writes happen on the listener thread
+_log_queue: queue.Queue = queue.Queue(-1)
+_listener = QueueListener(_log_queue, *logger.handlers, respect_handler_level=True)
+logger.handlers = [QueueHandler(_log_queue)]
+_listener.start()
+atexit.register(_listener.stop)
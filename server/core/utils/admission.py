@@ -0,0 +1,107 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from core.logger import logger
+from core.utils.metrics import registry
+
+QUEUE_DEPTH = registry.gauge("assistant_admission_queue_depth", "Requests waiting for an LLM slot.")
+IN_FLIGHT = registry.gauge("assistant_admission_in_flight", "Requests holding an LLM slot.")
+WAIT_TIME = registry.histogram("assistant_admission_wait_seconds", "Time spent waiting for an LLM slot.")
+REJECTED = registry.counter(
+    "assistant_admission_rejected_total",
+    "Requests rejected by admission control.",
+    labelnames=("reason",),
+)
+
+
+class AdmissionRejectedError(Exception):
+    """Raised when a request cannot be admitted, carries the HTTP status and the Retry-After hint."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounds the number of requests that run the LLM and embedding pipeline at the same time.
+
+    At most `max_concurrent` requests hold a slot, up to `max_queued` more wait for one. A request
+    arriving at a full queue is rejected immediately with 429, a queued request that does not get a
+    slot within `queue_timeout_seconds` is rejected with 503.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 16,
+        max_queued: int = 64,
+        queue_timeout_seconds: float = 10.0,
+        retry_after_seconds: int = 5,
+    ):
+        """
+        Initialize the admission controller.
+
+        Args:
+            max_concurrent: Maximum number of requests running at the same time
+            max_queued: Maximum number of requests waiting for a slot
+            queue_timeout_seconds: Maximum time a request waits for a slot
+            retry_after_seconds: Retry-After value sent with rejections
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.retry_after_seconds = retry_after_seconds
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._queued = 0
+        self._in_flight = 0
+
+    def _reject(self, status_code: int, reason: str) -> AdmissionRejectedError:
+        REJECTED.inc(reason=reason)
+        logger.warning(f"Admission rejected ({reason}): {self._queued} queued, {self._in_flight} in flight")
+        return AdmissionRejectedError(status_code, reason, self.retry_after_seconds)
+
+    async def acquire(self, timeout: float | None = None) -> None:
+        """
+        Wait for a slot.
+
+        Args:
+            timeout: Maximum time to wait, e.g. what is left of the request deadline, never more than
+                queue_timeout_seconds
+
+        Raises:
+            AdmissionRejectedError: When the queue is full or the wait times out
+        """
+        if self._in_flight + self._queued >= self.max_concurrent + self.max_queued:
+            raise self._reject(429, "queue_full")
+
+        self._queued += 1
+        QUEUE_DEPTH.inc()
+        start = time.perf_counter()
+        timeout = self.queue_timeout_seconds if timeout is None else min(timeout, self.queue_timeout_seconds)
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise self._reject(503, "queue_timeout") from None
+        finally:
+            self._queued -= 1
+            QUEUE_DEPTH.dec()
+            WAIT_TIME.observe(time.perf_counter() - start)
+        self._in_flight += 1
+        IN_FLIGHT.inc()
+
+    def release(self) -> None:
+        self._in_flight -= 1
+        IN_FLIGHT.dec()
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self, timeout: float | None = None) -> AsyncIterator[None]:
+        await self.acquire(timeout)
+        try:
+            yield
+        finally:
+            self.release()
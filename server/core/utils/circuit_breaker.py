@@ -0,0 +1,106 @@
+import threading
+import time
+
+from core.logger import logger
+from core.utils.metrics import registry
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+BREAKER_STATE = registry.gauge(
+    "assistant_circuit_breaker_state",
+    "Circuit breaker state: 0 closed, 1 half-open, 2 open.",
+    labelnames=("name",),
+)
+BREAKER_TRANSITIONS = registry.counter(
+    "assistant_circuit_breaker_transitions_total",
+    "Circuit breaker state changes.",
+    labelnames=("name", "state"),
+)
+BREAKER_REJECTED = registry.counter(
+    "assistant_circuit_breaker_rejected_total",
+    "Calls skipped because the circuit breaker was open.",
+    labelnames=("name",),
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Stops calling a dependency after repeated failures or slow responses.
+
+    After `failure_threshold` consecutive failures the breaker opens and every call is rejected for
+    `cool_down_seconds`. Then a single trial call is let through (half-open): its success closes the
+    breaker, its failure opens it for another cool-down. A call slower than `slow_call_seconds` counts
+    as a failure even when it succeeds.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        slow_call_seconds: float | None = None,
+        cool_down_seconds: float = 30.0,
+    ):
+        """
+        Initialize a closed circuit breaker.
+
+        Args:
+            name: Name of the protected dependency, used as the metrics label
+            failure_threshold: Consecutive failures that open the breaker
+            slow_call_seconds: Latency above which a successful call counts as a failure, None disables it
+            cool_down_seconds: How long the breaker stays open before a trial call
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.cool_down_seconds = cool_down_seconds
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        BREAKER_STATE.set(STATE_VALUES[CLOSED], name=name)
+
+    def _transition(self, state: str) -> None:
+        self.state = state
+        BREAKER_STATE.set(STATE_VALUES[state], name=self.name)
+        BREAKER_TRANSITIONS.inc(name=self.name, state=state)
+        logger.warning(f"Circuit breaker '{self.name}' is {state}")
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now, counting the rejection when it may not."""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.cool_down_seconds:
+                self._transition(HALF_OPEN)
+            if self.state == CLOSED or (self.state == HALF_OPEN and not self._trial_in_flight):
+                self._trial_in_flight = self.state == HALF_OPEN
+                return True
+        BREAKER_REJECTED.inc(name=self.name)
+        return False
+
+    def release(self) -> None:
+        """Give back a permission whose call ended without an outcome, e.g. because it was cancelled."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self, seconds: float) -> None:
+        if self.slow_call_seconds is not None and seconds > self.slow_call_seconds:
+            self.record_failure()
+            return
+        with self._lock:
+            self._failures = 0
+            self._trial_in_flight = False
+            if self.state != CLOSED:
+                self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self.state == HALF_OPEN or (self.state == CLOSED and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                self._transition(OPEN)
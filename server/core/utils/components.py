@@ -1,9 +1,25 @@
 from core.config.config import config
-from langchain_google_vertexai.chat_models import ChatVertexAI
-from langchain_google_vertexai.embeddings import VertexAIEmbeddings
+from langchain_core.embeddings import Embeddings
+
+# The Vertex AI SDK is imported on first use, it is one of the slowest imports of the server
+
+# Model name selecting the offline mocks of dal.mocks, used by the load-test harness
+MOCK_MODEL = "mock"
 
 
 def get_llm(temperature=0.1, max_tokens=1024):
+    if config.llm == MOCK_MODEL:
+        from dal.mocks import MockChatModel
+
+        return MockChatModel(
+            latency_seconds=config.mock.LLM_LATENCY_SECONDS,
+            tokens_per_second=config.mock.LLM_TOKENS_PER_SECOND,
+            output_tokens=config.mock.LLM_OUTPUT_TOKENS,
+            max_tokens=max_tokens,
+        )
+
+    from langchain_google_vertexai.chat_models import ChatVertexAI
+
     return ChatVertexAI(
         model_name=config.llm,
         temperature=temperature,
@@ -12,6 +28,28 @@ def get_llm(temperature=0.1, max_tokens=1024):
 
 
 def get_embedding():
+    if config.embedding == MOCK_MODEL:
+        from dal.mocks import MockEmbeddings
+
+        return MockEmbeddings(
+            dimensions=config.mock.EMBEDDING_DIMENSIONS,
+            latency_seconds=config.mock.EMBEDDING_LATENCY_SECONDS,
+        )
+
+    from langchain_google_vertexai.embeddings import VertexAIEmbeddings
+
     return VertexAIEmbeddings(
         model_name=config.embedding,
     )
+
+
+def embed_queries(embedding: Embeddings, queries: list[str]) -> list[list[float]]:
+    """Embed many queries with one batched request, keeping the query task type on Vertex AI."""
+    if config.embedding == MOCK_MODEL:
+        return embedding.embed_documents(queries)
+
+    from langchain_google_vertexai.embeddings import VertexAIEmbeddings
+
+    if isinstance(embedding, VertexAIEmbeddings):
+        return embedding.embed_documents(queries, embeddings_task_type="RETRIEVAL_QUERY")
+    return embedding.embed_documents(queries)
@@ -0,0 +1,81 @@
+import time
+from contextvars import ContextVar
+
+from core.config.config import config
+from core.logger import logger
+from core.utils.metrics import registry
+
+DEGRADATIONS = registry.counter(
+    "assistant_deadline_degradations_total",
+    "Pipeline steps degraded to stay within the request deadline.",
+    labelnames=("kind",),
+)
+
+
+class Deadline:
+    """Time budget of one request, shared by the pipeline stages through a context variable."""
+
+    def __init__(self, budget_seconds: float):
+        self.budget_seconds = budget_seconds
+        self.expires_at = time.monotonic() + budget_seconds
+        self.degradations: list[str] = []
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def share(self, fraction: float) -> float:
+        """Sub-budget of a stage: its fraction of the whole budget, never more than what is left."""
+        return min(self.remaining(), self.budget_seconds * fraction)
+
+    def degrade(self, kind: str) -> None:
+        """Record that a stage was degraded to stay within the deadline."""
+        if kind in self.degradations:
+            return
+        self.degradations.append(kind)
+        DEGRADATIONS.inc(kind=kind)
+        logger.info(f"Deadline degradation: {kind} ({self.remaining():.2f}s of {self.budget_seconds:.2f}s left)")
+
+    def report(self) -> dict:
+        return {
+            "budget_s": round(self.budget_seconds, 3),
+            "remaining_s": round(self.remaining(), 3),
+            "degradations": list(self.degradations),
+        }
+
+
+_request_deadline: ContextVar[Deadline | None] = ContextVar("request_deadline", default=None)
+
+
+def deadline_budget(budget_seconds: float | None = None) -> float:
+    """
+    Budget of a request deadline.
+
+    Args:
+        budget_seconds: Requested budget, defaults to DeadlineConfig.DEFAULT_BUDGET_SECONDS and is capped at
+            DeadlineConfig.MAX_BUDGET_SECONDS
+    """
+    if budget_seconds is None or budget_seconds <= 0:
+        budget_seconds = config.deadline.DEFAULT_BUDGET_SECONDS
+    return min(budget_seconds, config.deadline.MAX_BUDGET_SECONDS)
+
+
+def start_deadline(budget_seconds: float | None = None, deadline: Deadline | None = None) -> Deadline:
+    """
+    Start the deadline of the current request context.
+
+    Args:
+        budget_seconds: Requested budget, see deadline_budget
+        deadline: Deadline started earlier for the same request, e.g. before it waited for admission,
+            continued instead of starting a new one
+
+    Returns:
+        The started deadline
+    """
+    if deadline is None:
+        deadline = Deadline(deadline_budget(budget_seconds))
+    _request_deadline.set(deadline)
+    return deadline
+
+
+def current_deadline() -> Deadline | None:
+    return _request_deadline.get()
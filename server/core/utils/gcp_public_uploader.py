@@ -1,13 +1,15 @@
 from typing import List
 
 from core.logger import logger
-from google.cloud.storage import Client
 
 
 class GCPPublicUploader:
     """Uploads PDFs to a public GCP bucket for viewing from AI Assistant."""
 
     def __init__(self, bucket_name: str):
+        # Imported here, the storage SDK is heavy and only needed once a client is created
+        from google.cloud.storage import Client
+
         self.client = Client()
         self.bucket = self.client.bucket(bucket_name)
         self.bucket_name = bucket_name
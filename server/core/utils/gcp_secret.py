@@ -1,24 +1,54 @@
-from google.auth import default
-from google.cloud.secretmanager import SecretManagerServiceClient
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 
+@lru_cache(maxsize=1)
+def get_secret_manager_client():
+    """Shared Secret Manager client, created on first use."""
+    from google.cloud.secretmanager import SecretManagerServiceClient
+
+    return SecretManagerServiceClient()
+
+
+@lru_cache(maxsize=None)
 def get_secret(secret_name: str) -> str:
     """
     Retrieves a secret from Google Cloud Secret Manager.
 
+    The value is fetched once per process and memoized.
+
     Args:
         secret_name (str): The name of the secret to retrieve.
 
     Returns:
         str: The value of the secret.
     """
-    client: SecretManagerServiceClient = SecretManagerServiceClient()
+    client = get_secret_manager_client()
     name = f"projects/{get_active_gcloud_project()}/secrets/{secret_name}/versions/latest"
     response = client.access_secret_version(name=name)
     return response.payload.data.decode("UTF-8")
 
 
+def prefetch_secrets(secret_names: list[str]) -> dict[str, str]:
+    """
+    Fetch several secrets in parallel, warming the get_secret memo.
+
+    Args:
+        secret_names: Names of the secrets to fetch
+
+    Returns:
+        The secret values by name
+    """
+    get_active_gcloud_project()
+    get_secret_manager_client()
+    with ThreadPoolExecutor(max_workers=max(1, len(secret_names))) as executor:
+        return dict(zip(secret_names, executor.map(get_secret, secret_names), strict=True))
+
+
+@lru_cache(maxsize=1)
 def get_active_gcloud_project():
+    from google.auth import default
+
     try:
         credentials, project_id = default()
         if project_id:
@@ -1,13 +1,79 @@
+import threading
+import time
+from functools import cached_property, lru_cache
 from typing import List, Optional
 
 from core.config.config import config
+from core.logger import logger
 from core.utils.gcp_public_uploader import GCPPublicUploader
 from langchain_core.documents import Document
 
 
 class PublicDocumentHelper:
-    def __init__(self):
-        self.public_uploader = GCPPublicUploader(config.gcp.PUBLIC_BUCKET_NAME)
+    """
+    Resolves public URLs of documents from an in-memory manifest of the public bucket.
+
+    The manifest is loaded by the warm-up and refreshed in a background thread when it is older than
+    `manifest_ttl_seconds`, so lookups never hit GCS on the request path. Until the first listing
+    succeeds lookups find nothing, and a failed listing is retried after `retry_seconds`.
+    """
+
+    def __init__(
+        self,
+        manifest_ttl_seconds: float = config.gcp.PUBLIC_MANIFEST_TTL_SECONDS,
+        retry_seconds: float = config.gcp.PUBLIC_MANIFEST_RETRY_SECONDS,
+    ):
+        self.manifest_ttl_seconds = manifest_ttl_seconds
+        self.retry_seconds = retry_seconds
+        self._manifest: dict[str, str] = {}
+        self._attempted_at: float | None = None
+        self._failed = False
+        self._refreshing = threading.Lock()
+
+    @cached_property
+    def public_uploader(self) -> GCPPublicUploader:
+        """GCS client, created on first use so that documents carrying a `public_url` never need it."""
+        return GCPPublicUploader(config.gcp.PUBLIC_BUCKET_NAME)
+
+    def refresh_manifest(self) -> None:
+        """Reload the manifest from the public bucket, keeping the previous one and re-raising on failure."""
+        self._attempted_at = time.monotonic()
+        try:
+            manifest = {
+                name: self.public_uploader.get_public_url(name) for name in self.public_uploader.list_public_pdfs()
+            }
+        except Exception as e:
+            self._failed = True
+            logger.error(f"Failed to list public documents, retrying in {self.retry_seconds:.0f}s: {e}")
+            raise
+        self._manifest = manifest
+        self._failed = False
+        logger.debug(f"Loaded public document manifest with {len(self._manifest)} entries")
+
+    def _refresh_due(self) -> bool:
+        if self._attempted_at is None:
+            return True
+        age = time.monotonic() - self._attempted_at
+        return age > (self.retry_seconds if self._failed else self.manifest_ttl_seconds)
+
+    def _refresh_in_background(self) -> None:
+        if not self._refreshing.acquire(blocking=False):
+            return
+
+        def refresh():
+            try:
+                self.refresh_manifest()
+            except Exception:
+                pass  # Logged by refresh_manifest, the next lookup after the retry delay tries again
+            finally:
+                self._refreshing.release()
+
+        threading.Thread(target=refresh, name="public-manifest-refresh", daemon=True).start()
+
+    def _get_manifest(self) -> dict[str, str]:
+        if self._refresh_due():
+            self._refresh_in_background()
+        return self._manifest
 
     def get_document_public_url(self, source_key: str) -> Optional[str]:
         """
@@ -19,9 +85,7 @@ class PublicDocumentHelper:
         Returns:
             Public URL if document exists, None otherwise
         """
-        if self.public_uploader.pdf_exists(source_key):
-            return self.public_uploader.get_public_url(source_key)
-        return None
+        return self._get_manifest().get(source_key)
 
     def find_public_url_by_filename(self, filename: str) -> Optional[str]:
         """
@@ -33,10 +97,7 @@ class PublicDocumentHelper:
         Returns:
             Public URL if found, None otherwise
         """
-        if self.public_uploader.pdf_exists(filename):
-            return self.public_uploader.get_public_url(filename)
-
-        return None
+        return self._get_manifest().get(filename)
 
     def extract_public_url_from_document(self, document: Document) -> Optional[str]:
         """Extract public URL from document metadata or generate it from source."""
@@ -72,12 +133,18 @@ class PublicDocumentHelper:
 
     def list_all_public_documents(self) -> List[str]:
         """List all documents available in the public bucket."""
-        return self.public_uploader.list_public_pdfs()
+        return list(self._get_manifest())
+
+
+@lru_cache(maxsize=1)
+def get_public_document_helper() -> PublicDocumentHelper:
+    """Shared helper so the GCS client and the manifest are created once per process."""
+    return PublicDocumentHelper()
 
 
 def get_document_viewer_link(document: Document) -> Optional[str]:
     """Quick function to get a viewer link for a document."""
-    helper = PublicDocumentHelper()
+    helper = get_public_document_helper()
     return helper.extract_public_url_from_document(document)
 
 
@@ -88,7 +155,7 @@ def format_source_with_link(document: Document) -> str:
     Returns:
         Formatted string like "Source: document.pdf (Page 5) - [View PDF](url#page=5)" or just "Source: document.pdf (Page 5)"
     """
-    helper = PublicDocumentHelper()
+    helper = get_public_document_helper()
     source_info = helper.get_viewable_source_info(document)
 
     source_name = source_info["source"]
@@ -116,7 +183,7 @@ def get_sources_with_links(documents: List[Document]) -> List[dict]:
     Returns:
         List of dicts with source information and links
     """
-    helper = PublicDocumentHelper()
+    helper = get_public_document_helper()
     sources = []
 
     for doc in documents:
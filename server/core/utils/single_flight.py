@@ -0,0 +1,67 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+from core.utils.metrics import registry
+
+COALESCED = registry.counter("assistant_coalesced_requests_total", "Requests served by another in-flight execution.")
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent executions of the same asynchronous call.
+
+    The first caller for a key starts the execution as a task, callers arriving while it is in flight
+    await the same task. Every caller waits through `asyncio.shield`, so a caller that times out or is
+    cancelled leaves the shared execution running for the others. The execution is cancelled when its
+    last caller leaves, nobody would read its result.
+    """
+
+    def __init__(self):
+        self._in_flight: dict[Hashable, asyncio.Task] = {}
+        self._waiters: dict[asyncio.Task, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
+
+    async def do(
+        self, key: Hashable, func: Callable[[], Awaitable[Any]], timeout: float | None = None
+    ) -> tuple[Any, bool]:
+        """
+        Run `func` once for all concurrent callers with the same key.
+
+        Args:
+            key: Identifies equivalent calls
+            func: Starts the execution, only called by the first caller
+            timeout: Maximum time this caller waits, the shared execution is only cancelled when no other
+                caller waits for it
+
+        Returns:
+            The result and whether it was shared with an execution started by another caller
+
+        Raises:
+            asyncio.TimeoutError: When the result is not ready within timeout
+        """
+        task = self._in_flight.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            COALESCED.inc()
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout=timeout), shared
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                task.cancel()
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved when every caller gave up before the task failed
+            task.exception()
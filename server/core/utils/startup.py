@@ -0,0 +1,37 @@
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from core.logger import logger
+from core.utils.metrics import registry
+
+STARTUP_PHASE = registry.gauge(
+    "assistant_startup_phase_seconds",
+    "Duration of the startup phases of the process.",
+    labelnames=("phase",),
+)
+
+
+class StartupReport:
+    """Collects how long each startup phase took and logs a one-line summary."""
+
+    def __init__(self):
+        self.phases: dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.phases[name] = round(elapsed, 3)
+            STARTUP_PHASE.set(elapsed, phase=name)
+
+    def log(self) -> None:
+        total = sum(self.phases.values())
+        details = ", ".join(f"{name}={seconds:.3f}s" for name, seconds in self.phases.items())
+        logger.info(f"Startup finished in {total:.3f}s ({details})")
+
+
+startup_report = StartupReport()
@@ -0,0 +1,191 @@
+import queue
+import random
+import threading
+import time
+from typing import Any, Callable
+
+from core.config.config import config
+from core.logger import logger
+from core.utils.metrics import registry
+from langchain_core.callbacks import BaseCallbackHandler
+
+TRACES = registry.counter(
+    "assistant_traces_total",
+    "Request traces by outcome: exported because sampled, forced or failed, skipped, or dropped on a full buffer.",
+    labelnames=("outcome",),
+)
+TRACE_BUFFER_DEPTH = registry.gauge("assistant_trace_buffer_depth", "Traces waiting to be exported.")
+
+
+def _snapshot(payload: Any) -> Any:
+    """Shallow copy of a callback payload, so that later changes to the chain state do not leak into the trace."""
+    if isinstance(payload, dict):
+        return dict(payload)
+    if isinstance(payload, list):
+        return list(payload)
+    return payload
+
+
+def _recorded(event: str) -> Callable[..., None]:
+    def record(self: "TraceRecorder", *args: Any, **kwargs: Any) -> None:
+        if event.endswith("_error"):
+            self.failed = True
+        if event.endswith("_start"):
+            kwargs["metadata"] = (kwargs.get("metadata") or {}) | {"recorded_at": time.time()}
+        args = tuple(_snapshot(arg) for arg in args)
+        kwargs = {key: _snapshot(value) for key, value in kwargs.items()}
+        self.events.append((event, args, kwargs))
+
+    record.__name__ = event
+    return record
+
+
+class TraceRecorder(BaseCallbackHandler):
+    """
+    Callback handler that only records the callback events of one request.
+
+    Recording is a list append on the request path. Whether the trace is kept is decided when the request
+    ends, so failed requests can always be traced, and kept traces are replayed into the Langfuse handler
+    by the TraceExporter thread. Observation times in Langfuse are therefore export times, the time of
+    each step is kept in the `recorded_at` metadata.
+    """
+
+    run_inline = True
+
+    def __init__(self, sampled: bool, forced: bool = False):
+        self.sampled = sampled
+        self.forced = forced
+        self.failed = False
+        self.events: list[tuple[str, tuple, dict]] = []
+
+    on_chain_start = _recorded("on_chain_start")
+    on_chain_end = _recorded("on_chain_end")
+    on_chain_error = _recorded("on_chain_error")
+    on_llm_start = _recorded("on_llm_start")
+    on_chat_model_start = _recorded("on_chat_model_start")
+    on_llm_end = _recorded("on_llm_end")
+    on_llm_error = _recorded("on_llm_error")
+    on_retriever_start = _recorded("on_retriever_start")
+    on_retriever_end = _recorded("on_retriever_end")
+    on_retriever_error = _recorded("on_retriever_error")
+    on_tool_start = _recorded("on_tool_start")
+    on_tool_end = _recorded("on_tool_end")
+    on_tool_error = _recorded("on_tool_error")
+
+    def outcome(self, failed: bool = False) -> str | None:
+        """The reason to export this trace, or None when it should be skipped."""
+        if self.forced:
+            return "forced"
+        if (failed or self.failed) and config.tracing.ALWAYS_TRACE_ERRORS:
+            return "error"
+        if self.sampled:
+            return "sampled"
+        return None
+
+
+class TraceExporter:
+    """
+    Replays kept traces into the Langfuse handler on a background thread, in batches.
+
+    The buffer is bounded: when the exporter falls behind, new traces are dropped instead of blocking
+    the request that produced them.
+    """
+
+    def __init__(self, buffer_size: int = 1000, batch_size: int = 50):
+        """
+        Initialize the exporter, the thread is started with the first trace.
+
+        Args:
+            buffer_size: Maximum number of traces waiting to be exported
+            batch_size: Maximum number of traces replayed per batch
+        """
+        self.batch_size = batch_size
+        self._queue: queue.Queue[list | None] = queue.Queue(maxsize=buffer_size)
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+
+    def submit(self, recorder: TraceRecorder, failed: bool = False) -> None:
+        """Queue the trace of a finished request when it should be kept, never blocking."""
+        outcome = recorder.outcome(failed)
+        if outcome is None:
+            TRACES.inc(outcome="skipped")
+            return
+        self._start()
+        try:
+            self._queue.put_nowait(recorder.events)
+        except queue.Full:
+            TRACES.inc(outcome="dropped")
+            return
+        TRACES.inc(outcome=outcome)
+        TRACE_BUFFER_DEPTH.set(self._queue.qsize())
+
+    @staticmethod
+    def _replay(handler: BaseCallbackHandler, events: list[tuple[str, tuple, dict]]) -> None:
+        for event, args, kwargs in events:
+            try:
+                getattr(handler, event)(*args, **kwargs)
+            except Exception as e:
+                logger.debug(f"Failed to export trace event {event}: {e}")
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            TRACE_BUFFER_DEPTH.set(self._queue.qsize())
+
+            try:
+                handler = config.langfuse_handler
+            except Exception as e:
+                logger.warning(f"Langfuse handler unavailable, dropping {len(batch)} traces: {e}")
+                handler = None
+
+            for events in batch:
+                if events is None:
+                    return
+                if handler is not None:
+                    self._replay(handler, events)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Export the buffered traces and stop the thread, giving up after `timeout` seconds."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout=timeout)
+
+
+trace_exporter = TraceExporter(config.tracing.BUFFER_SIZE, config.tracing.EXPORT_BATCH_SIZE)
+
+
+def start_trace(force: bool = False) -> TraceRecorder | None:
+    """
+    Start recording the trace of a request.
+
+    Args:
+        force: Keep the trace regardless of the sampling rate
+
+    Returns:
+        The recorder to attach as a callback, or None when the request cannot end up traced
+    """
+    if not config.tracing.ENABLED:
+        return None
+    sampled = random.random() < config.tracing.SAMPLE_RATE
+    if not (sampled or force or config.tracing.ALWAYS_TRACE_ERRORS):
+        TRACES.inc(outcome="skipped")
+        return None
+    return TraceRecorder(sampled=sampled, forced=force)
+
+
+def finish_trace(recorder: TraceRecorder | None, failed: bool = False) -> None:
+    """Hand the trace of a finished request to the exporter."""
+    if recorder is not None:
+        trace_exporter.submit(recorder, failed)
@@ -0,0 +1,117 @@
+import time
+from dataclasses import dataclass, field
+
+from core.config.config import config
+from core.logger import logger
+from core.utils.ttl_cache import TTLCache
+from dal.mongo_db import MongoDB
+
+
+@dataclass
+class Conversation:
+    """Server-side state of one chat: the stored messages and the running history summary."""
+
+    chat_id: str
+    messages: list[dict] = field(default_factory=list)
+    summary: str = ""
+    summarized_messages: int = 0
+    stored: bool = False
+    version: int = 0
+
+    @property
+    def history_summary(self) -> dict:
+        return {"summary": self.summary, "summarized_messages": self.summarized_messages}
+
+    def append_turn(self, prompt: str, answer: str, history_summary: dict) -> list[dict]:
+        """Append a user/AI turn and the history summary computed for it."""
+        turn = [{"role": "user", "content": prompt}, {"role": "ai", "content": answer}]
+        self.messages.extend(turn)
+        self.summary = history_summary.get("summary", "")
+        self.summarized_messages = history_summary.get("summarized_messages", 0)
+        return turn
+
+    def trim(self, max_messages: int) -> None:
+        """Drop the oldest messages beyond max_messages, they are covered by the summary."""
+        dropped = max(0, len(self.messages) - max_messages)
+        del self.messages[:dropped]
+        self.summarized_messages = max(0, self.summarized_messages - dropped)
+
+
+class ConversationStore:
+    """
+    Conversation state keyed by chatId, persisted in MongoDB behind an in-memory LRU cache.
+
+    Every write increments the stored `version`. A read only trusts the cached conversation while
+    its version is still the stored one, another worker may have recorded a turn since. Writes go to
+    both. Only the last `max_messages` messages are kept, older ones live on in the history summary.
+    """
+
+    def __init__(
+        self,
+        collection_name: str = "conversations",
+        cache_size: int = 2048,
+        cache_ttl_seconds: float = 1800.0,
+        max_messages: int = 200,
+    ):
+        """
+        Initialize the conversation store.
+
+        Args:
+            collection_name: Collection in the assistant database holding the conversations
+            cache_size: Maximum number of conversations kept in memory
+            cache_ttl_seconds: How long an idle conversation stays in memory
+            max_messages: Maximum number of messages stored per conversation
+        """
+        self.collection = MongoDB.async_client[config.mongo.DB_NAME][collection_name]
+        self.cache: TTLCache[Conversation] = TTLCache(max_size=cache_size, ttl_seconds=cache_ttl_seconds)
+        self.max_messages = max_messages
+
+    async def aget(self, chat_id: str) -> Conversation | None:
+        """Load a conversation, from memory when no other worker changed it since."""
+        conversation = self.cache.get(chat_id)
+        if conversation is None:
+            document = await self.collection.find_one({"_id": chat_id})
+        else:
+            # Only transfers the conversation when the cached one is stale
+            document = await self.collection.find_one({"_id": chat_id, "version": {"$ne": conversation.version}})
+            if document is None:
+                return conversation
+        if document is None:
+            return None
+        conversation = Conversation(
+            chat_id=chat_id,
+            messages=document.get("messages", []),
+            summary=document.get("summary", ""),
+            summarized_messages=document.get("summarized_messages", 0),
+            stored=True,
+            version=document.get("version", 0),
+        )
+        self.cache.put(chat_id, conversation)
+        return conversation
+
+    async def aappend_turn(self, conversation: Conversation, prompt: str, answer: str, history_summary: dict) -> None:
+        """Record a completed turn in memory and in MongoDB."""
+        turn = conversation.append_turn(prompt, answer, history_summary)
+        new_messages = turn if conversation.stored else list(conversation.messages)
+        conversation.trim(self.max_messages)
+        self.cache.put(conversation.chat_id, conversation)
+
+        try:
+            await self.collection.update_one(
+                {"_id": conversation.chat_id},
+                {
+                    "$push": {"messages": {"$each": new_messages, "$slice": -self.max_messages}},
+                    "$set": {
+                        "summary": conversation.summary,
+                        "summarized_messages": conversation.summarized_messages,
+                        "updated_at": time.time(),
+                    },
+                    "$inc": {"version": 1},
+                },
+                upsert=True,
+            )
+            conversation.stored = True
+            # Stays behind the stored version when another worker wrote in between, the next read reloads it
+            conversation.version += 1
+        except Exception as e:
+            logger.error(f"Failed to persist conversation '{conversation.chat_id}': {e}")
@@ -0,0 +1,75 @@
+from functools import partial
+from typing import Callable
+
+import numpy as np
+from core.config.config import config
+
+CutoffStrategy = Callable[[np.ndarray], int]
+
+
+def _clamp(k: int, n: int, min_k: int, max_k: int) -> int:
+    """Clamp k into [min_k, max_k] without exceeding the number of candidates."""
+    return min(n, max_k, max(min_k, k))
+
+
+def normalized_threshold_cutoff(scores: np.ndarray, threshold: float = 0.90, min_k: int = 3, max_k: int = 15) -> int:
+    """Keep candidates whose min-max normalized score is above the threshold."""
+    if scores.size == 0:
+        return 0
+    spread = scores.max() - scores.min()
+    normalized = (scores - scores.min()) / (spread + 1e-10)
+    return _clamp(int(np.count_nonzero(normalized > threshold)), scores.size, min_k, max_k)
+
+
+def largest_gap_cutoff(scores: np.ndarray, min_k: int = 3, max_k: int = 15) -> int:
+    """Cut at the largest drop between consecutive scores within the [min_k, max_k] window."""
+    if scores.size <= min_k:
+        return scores.size
+    window = scores[: max_k + 1]
+    gaps = window[:-1] - window[1:]
+    gaps[: max(min_k - 1, 0)] = -np.inf
+    return _clamp(int(np.argmax(gaps)) + 1, scores.size, min_k, max_k)
+
+
+def absolute_threshold_cutoff(scores: np.ndarray, threshold: float = 0.75, min_k: int = 3, max_k: int = 15) -> int:
+    """Keep candidates whose raw similarity score reaches the threshold."""
+    return _clamp(int(np.count_nonzero(scores >= threshold)), scores.size, min_k, max_k)
+
+
+def fixed_k_cutoff(scores: np.ndarray, k: int = 6) -> int:
+    """Always keep the top k candidates."""
+    return min(scores.size, k)
+
+
+def get_cutoff_strategy(name: str) -> CutoffStrategy:
+    """
+    Build the cutoff strategy configured in MongoConfig.
+
+    Args:
+        name: One of 'normalized_threshold', 'largest_gap', 'absolute_threshold', 'fixed_k'
+
+    Returns:
+        Callable that maps a descending score vector to the number of documents to keep
+    """
+    mongo = config.mongo
+    if mongo.CUTOFF_MIN_K < 1:
+        raise ValueError(f"CUTOFF_MIN_K must be at least 1, got {mongo.CUTOFF_MIN_K}")
+    strategies: dict[str, CutoffStrategy] = {
+        "normalized_threshold": partial(
+            normalized_threshold_cutoff,
+            threshold=mongo.CUTOFF_NORMALIZED_THRESHOLD,
+            min_k=mongo.CUTOFF_MIN_K,
+            max_k=mongo.CUTOFF_MAX_K,
+        ),
+        "largest_gap": partial(largest_gap_cutoff, min_k=mongo.CUTOFF_MIN_K, max_k=mongo.CUTOFF_MAX_K),
+        "absolute_threshold": partial(
+            absolute_threshold_cutoff,
+            threshold=mongo.CUTOFF_ABSOLUTE_THRESHOLD,
+            min_k=mongo.CUTOFF_MIN_K,
+            max_k=mongo.CUTOFF_MAX_K,
+        ),
+        "fixed_k": partial(fixed_k_cutoff, k=mongo.CUTOFF_FIXED_K),
+    }
+    if name not in strategies:
+        raise ValueError(f"Unknown cutoff strategy '{name}'. Available: {', '.join(strategies)}")
+    return strategies[name]
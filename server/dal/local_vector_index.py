@@ -0,0 +1,275 @@
+import threading
+
+import numpy as np
+from core.config.config import config
+from core.interfaces import BaseRetriever
+from core.logger import logger
+from core.utils.metrics import stage_timer
+from dal.cutoff_strategies import CutoffStrategy, get_cutoff_strategy
+from dal.mongo_db import CachedQueryEmbedding
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from pymongo.collection import Collection
+
+
+class LocalVectorIndex(CachedQueryEmbedding, BaseRetriever):
+    """
+    In-process mirror of a MongoDB vector collection answering cosine top-k with one matrix-vector product.
+
+    Embeddings are kept in a contiguous, row-normalized float32 matrix. The mirror is refreshed from a
+    change stream when the deployment supports it, otherwise by polling for new `_id`s. Any object with the
+    pymongo `find`/`count_documents` interface (e.g. a mongomock collection) can be used as the source.
+    """
+
+    def __init__(
+        self,
+        collection: Collection,
+        embedding: Embeddings,
+        relevance_tolerance: float = 0.4,
+        text_key: str = "text",
+        embedding_key: str = "embedding",
+        refresh_interval_seconds: float = 60.0,
+        use_change_stream: bool = True,
+        cutoff_strategy: CutoffStrategy | None = None,
+        auto_refresh: bool = True,
+    ):
+        """
+        Initialize the index and load the whole collection into memory.
+
+        Args:
+            collection: Source collection holding the text, embedding and metadata fields
+            embedding: Embedding model used for queries, must match the one used at ingestion
+            relevance_tolerance: Minimum score for non auto-k retrieval
+            text_key: Field holding the chunk text
+            embedding_key: Field holding the chunk embedding
+            refresh_interval_seconds: Polling interval when change streams are unavailable
+            use_change_stream: Try to follow the collection with a change stream before falling back to polling
+            cutoff_strategy: Strategy used for auto-k, defaults to the one configured in MongoConfig
+            auto_refresh: Start the background refresh thread
+        """
+        self.collection = collection
+        self.embedding = embedding
+        self.relevance_tolerance = relevance_tolerance
+        self.text_key = text_key
+        self.embedding_key = embedding_key
+        self.refresh_interval_seconds = refresh_interval_seconds
+        self.use_change_stream = use_change_stream
+        self.cutoff_strategy = cutoff_strategy or get_cutoff_strategy(config.mongo.CUTOFF_STRATEGY)
+        self.embedding_cache = self.new_embedding_cache()
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._matrix = np.empty((0, 0), dtype=np.float32)
+        self._ids: list = []
+        self._documents: list[Document] = []
+        self._last_id = None
+
+        self.load()
+        if auto_refresh:
+            self.start()
+
+    @property
+    def query_embedding_model(self) -> Embeddings:
+        return self.embedding
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def _parse(self, raw: dict) -> tuple[np.ndarray, Document] | None:
+        """Split a raw Mongo document into its embedding row and a LangChain Document."""
+        vector = raw.get(self.embedding_key)
+        if vector is None or self.text_key not in raw:
+            return None
+        metadata = {key: value for key, value in raw.items() if key not in (self.text_key, self.embedding_key)}
+        metadata["_id"] = str(metadata["_id"])
+        return np.asarray(vector, dtype=np.float32), Document(page_content=raw[self.text_key], metadata=metadata)
+
+    @staticmethod
+    def _normalize_rows(rows: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(rows, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return np.ascontiguousarray(rows / norms, dtype=np.float32)
+
+    def _build(self, raw_docs) -> tuple[np.ndarray, list, list[Document], object]:
+        rows, ids, documents, last_id = [], [], [], None
+        for raw in raw_docs:
+            last_id = raw["_id"]
+            parsed = self._parse(raw)
+            if parsed is None:
+                continue
+            rows.append(parsed[0])
+            ids.append(raw["_id"])
+            documents.append(parsed[1])
+        matrix = self._normalize_rows(np.vstack(rows)) if rows else np.empty((0, 0), dtype=np.float32)
+        return matrix, ids, documents, last_id
+
+    def load(self) -> None:
+        """Load every document of the collection, replacing the current mirror."""
+        matrix, ids, documents, last_id = self._build(self.collection.find({}).sort("_id", 1))
+        with self._lock:
+            self._matrix, self._ids, self._documents, self._last_id = matrix, ids, documents, last_id
+        logger.info(f"Local vector index loaded {len(documents)} documents")
+
+    # The mirror is copy-on-write: updates build a new matrix and new lists and swap them in under the lock,
+    # so a search working on the previous ones is never affected.
+
+    def _append(self, matrix: np.ndarray, ids: list, documents: list[Document]) -> None:
+        with self._lock:
+            known = set(self._ids)
+            keep = [i for i, doc_id in enumerate(ids) if doc_id not in known]
+            if not keep:
+                return
+            if len(keep) < len(ids):
+                matrix, ids, documents = matrix[keep], [ids[i] for i in keep], [documents[i] for i in keep]
+            self._matrix = matrix if self._matrix.size == 0 else np.vstack([self._matrix, matrix])
+            self._ids = self._ids + ids
+            self._documents = self._documents + documents
+
+    def _remove(self, doc_id) -> None:
+        with self._lock:
+            if doc_id not in self._ids:
+                return
+            position = self._ids.index(doc_id)
+            self._matrix = np.delete(self._matrix, position, axis=0)
+            self._ids = self._ids[:position] + self._ids[position + 1 :]
+            self._documents = self._documents[:position] + self._documents[position + 1 :]
+
+    def refresh(self) -> int:
+        """
+        Pull documents added since the last refresh.
+
+        Falls back to a full reload when documents were deleted from the collection.
+
+        Returns:
+            Number of documents added to the mirror
+        """
+        query = {} if self._last_id is None else {"_id": {"$gt": self._last_id}}
+        matrix, ids, documents, last_id = self._build(self.collection.find(query).sort("_id", 1))
+        if last_id is not None:
+            self._last_id = last_id
+        if documents:
+            self._append(matrix, ids, documents)
+
+        if self.collection.count_documents({}) < len(self):
+            self.load()
+        return len(documents)
+
+    def _watch(self, start_after=None):
+        """
+        Apply the events of one change stream until stopped or invalidated.
+
+        Returns:
+            The resume token of the invalidate event, None when stopped
+        """
+        with self.collection.watch(full_document="updateLookup", start_after=start_after) as stream:
+            logger.info("Local vector index is following the collection change stream")
+            while not self._stop.is_set():
+                change = stream.try_next()
+                if change is None:
+                    self._stop.wait(1.0)
+                    continue
+                operation = change["operationType"]
+                doc_id = change.get("documentKey", {}).get("_id")
+                if operation in ("delete", "replace", "update"):
+                    self._remove(doc_id)
+                if operation in ("insert", "replace", "update") and change.get("fullDocument"):
+                    matrix, ids, documents, _ = self._build([change["fullDocument"]])
+                    if documents:
+                        self._append(matrix, ids, documents)
+                elif operation in ("drop", "rename", "invalidate"):
+                    self.load()
+                    if operation == "invalidate":
+                        return change["_id"]
+        return None
+
+    def _follow_change_stream(self) -> bool:
+        """
+        Apply change stream events until stopped. Returns False when change streams are not supported.
+
+        A drop or rename of the collection invalidates the stream, it is then reopened right after the
+        invalidate event so the changes made since are still applied.
+        """
+        try:
+            start_after = None
+            while not self._stop.is_set():
+                start_after = self._watch(start_after)
+            return True
+        except Exception as e:
+            logger.warning(f"Change stream unavailable, falling back to polling: {e}")
+            return False
+
+    def _refresh_loop(self) -> None:
+        if self.use_change_stream and self._follow_change_stream():
+            return
+        while not self._stop.wait(self.refresh_interval_seconds):
+            try:
+                added = self.refresh()
+                if added:
+                    logger.debug(f"Local vector index added {added} documents")
+            except Exception as e:
+                logger.error(f"Local vector index refresh failed: {e}")
+
+    def start(self) -> None:
+        """Start the background refresh thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, name="local-vector-index", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """Stop the background refresh thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+
+    def search_by_vector(self, embedding_vector: list[float], k: int) -> list[tuple[Document, float]]:
+        """
+        Cosine top-k against the in-memory matrix.
+
+        Scores are mapped to (1 + cosine) / 2 so they are comparable with Atlas `vectorSearchScore`.
+        """
+        with self._lock:
+            matrix, documents = self._matrix, self._documents
+        if k <= 0 or matrix.size == 0:
+            return []
+
+        with stage_timer("vector_search"):
+            query_vector = np.asarray(embedding_vector, dtype=np.float32)
+            query_vector /= np.linalg.norm(query_vector) or 1.0
+            scores = (matrix @ query_vector + 1.0) / 2.0
+
+            k = min(k, scores.size)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+        return [
+            (
+                Document(
+                    page_content=documents[i].page_content,
+                    metadata=documents[i].metadata | {"score": float(scores[i])},
+                ),
+                float(scores[i]),
+            )
+            for i in top
+        ]
+
+    def _retrieve_by_vector(self, embedding_vector: list[float], k: int, **kwargs) -> list[Document]:
+        if "auto_k" in kwargs and kwargs["auto_k"]:
+            candidates = self.search_by_vector(
+                embedding_vector, kwargs.get("candidate_limit") or config.mongo.AUTO_K_CANDIDATE_LIMIT
+            )
+            if not candidates:
+                return []
+            scores = np.fromiter((score for _, score in candidates), dtype=np.float64, count=len(candidates))
+            return [doc for doc, _ in candidates[: self.cutoff_strategy(scores)]]
+
+        return [doc for doc, score in self.search_by_vector(embedding_vector, k) if score >= self.relevance_tolerance]
+
+    def retrieve(self, query: str, k: int = 5, **kwargs) -> list[Document]:
+        """Implement BaseRetriever interface method."""
+        return self._retrieve_by_vector(self.embed_query(query), k, **kwargs)
+
+    async def aretrieve(self, query: str, k: int = 5, **kwargs) -> list[Document]:
+        """Embed asynchronously, the in-memory search itself is cheap enough to run on the event loop."""
+        return self._retrieve_by_vector(await self.aembed_query(query), k, **kwargs)
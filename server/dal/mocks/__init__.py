@@ -1,7 +1,10 @@
-from mock_retriever import MockBaseRetriever
-from mock_websearch import MockWebSearchRetriever
+from dal.mocks.mock_models import MockChatModel, MockEmbeddings
+from dal.mocks.mock_retriever import MockBaseRetriever
+from dal.mocks.mock_websearch import MockWebSearchRetriever
 
 __all__ = [
     "MockBaseRetriever",
+    "MockChatModel",
+    "MockEmbeddings",
     "MockWebSearchRetriever",
 ]
@@ -0,0 +1,130 @@
+import asyncio
+import hashlib
+import time
+from typing import Any, AsyncIterator, Iterator
+
+import numpy as np
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+VOCABULARY = (
+    "the student can submit the request in NEPTUN before the deadline of the semester and the tuition fee "
+    "is paid by bank transfer according to the study and exam regulations of the university"
+).split()
+
+
+def _seed(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+
+
+class MockChatModel(BaseChatModel):
+    """
+    Deterministic chat model for offline testing and benchmarking.
+
+    The answer is a function of the prompt only, so repeated prompts get the same answer. Latency is
+    simulated as a time to first token followed by `output_tokens` tokens at `tokens_per_second`.
+    """
+
+    latency_seconds: float = 0.3
+    tokens_per_second: float = 100.0
+    output_tokens: int = 120
+    max_tokens: int | None = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "mock"
+
+    def _tokens(self, messages: list[BaseMessage], **kwargs: Any) -> list[str]:
+        limit = kwargs.get("max_output_tokens") or self.max_tokens or self.output_tokens
+        rng = np.random.default_rng(_seed("\n".join(str(message.content) for message in messages)))
+        return [VOCABULARY[i] for i in rng.integers(len(VOCABULARY), size=min(self.output_tokens, limit))]
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tokens = self._tokens(messages, **kwargs)
+        time.sleep(self.latency_seconds + len(tokens) / self.tokens_per_second)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=" ".join(tokens)))])
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tokens = self._tokens(messages, **kwargs)
+        await asyncio.sleep(self.latency_seconds + len(tokens) / self.tokens_per_second)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=" ".join(tokens)))])
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency_seconds)
+        for i, token in enumerate(self._tokens(messages, **kwargs)):
+            if i:
+                time.sleep(1 / self.tokens_per_second)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=(" " if i else "") + token))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency_seconds)
+        for i, token in enumerate(self._tokens(messages, **kwargs)):
+            if i:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=(" " if i else "") + token))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+class MockEmbeddings(Embeddings):
+    """Deterministic embedding model, every text maps to a fixed pseudo-random unit vector."""
+
+    def __init__(self, dimensions: int = 768, latency_seconds: float = 0.05):
+        """
+        Initialize the mock embedding model.
+
+        Args:
+            dimensions: Size of the embedding vectors
+            latency_seconds: Simulated latency of one embedding call, single or batched
+        """
+        self.dimensions = dimensions
+        self.latency_seconds = latency_seconds
+
+    def _vector(self, text: str) -> list[float]:
+        vector = np.random.default_rng(_seed(text)).standard_normal(self.dimensions)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        time.sleep(self.latency_seconds)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        await asyncio.sleep(self.latency_seconds)
+        return [self._vector(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self.aembed_documents([text]))[0]
@@ -1,48 +1,89 @@
+import asyncio
 import time
 
+import numpy as np
 from core.interfaces import BaseRetriever
-from langchain.schema import Document
+from core.utils.metrics import stage_timer
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 
 
 class MockBaseRetriever(BaseRetriever):
     """
     Mock database retriever for testing and development.
     Simulates vector search with predefined responses.
+    With an embedding model the documents are ranked by cosine similarity, otherwise by keyword overlap.
     """
 
-    def __init__(self, mock_documents: list[Document] | None = None, delay: float = 0.1):
+    def __init__(
+        self,
+        mock_documents: list[Document] | None = None,
+        delay: float = 0.1,
+        embedding: Embeddings | None = None,
+    ):
         """
         Initialize mock retriever with optional predefined documents.
 
         Args:
             mock_documents: Predefined documents to return
             delay: Simulated retrieval delay in seconds
+            embedding: Optional embedding model used to rank the documents, e.g. MockEmbeddings
         """
         self.delay = delay
         self.mock_documents = mock_documents or self._create_default_documents()
+        self.embedding = embedding
+        self._matrix = None
+        if embedding is not None:
+            rows = np.asarray(embedding.embed_documents([doc.page_content for doc in self.mock_documents]))
+            self._matrix = rows / np.linalg.norm(rows, axis=1, keepdims=True)
 
     def _create_default_documents(self) -> list[Document]:
         """Create some default mock documents for testing."""
         return [
             Document(
                 page_content="This is a sample document about artificial intelligence and machine learning.",
-                metadata={"source": "mock_doc_1.pdf", "page": 1, "type": "internal"},
+                metadata={
+                    "public_url": "https://example.com/mock_doc.pdf",
+                    "source": "mock_doc_1.pdf",
+                    "page": 1,
+                    "type": "internal",
+                },
             ),
             Document(
                 page_content="Python programming language is widely used for data science and AI development.",
-                metadata={"source": "mock_doc_2.pdf", "page": 1, "type": "internal"},
+                metadata={
+                    "public_url": "https://example.com/mock_doc.pdf",
+                    "source": "mock_doc_2.pdf",
+                    "page": 1,
+                    "type": "internal",
+                },
             ),
             Document(
                 page_content="LangChain is a framework for developing applications powered by language models.",
-                metadata={"source": "mock_doc_3.pdf", "page": 1, "type": "internal"},
+                metadata={
+                    "public_url": "https://example.com/mock_doc.pdf",
+                    "source": "mock_doc_3.pdf",
+                    "page": 1,
+                    "type": "internal",
+                },
             ),
             Document(
                 page_content="Vector databases enable efficient similarity search for large document collections.",
-                metadata={"source": "mock_doc_4.pdf", "page": 1, "type": "internal"},
+                metadata={
+                    "public_url": "https://example.com/mock_doc.pdf",
+                    "source": "mock_doc_4.pdf",
+                    "page": 1,
+                    "type": "internal",
+                },
             ),
             Document(
                 page_content="Natural language processing involves understanding and generating human language.",
-                metadata={"source": "mock_doc_5.pdf", "page": 1, "type": "internal"},
+                metadata={
+                    "public_url": "https://example.com/mock_doc.pdf",
+                    "source": "mock_doc_5.pdf",
+                    "page": 1,
+                    "type": "internal",
+                },
             ),
         ]
 
@@ -62,6 +103,38 @@ class MockBaseRetriever(BaseRetriever):
         if self.delay > 0:
             time.sleep(self.delay)
 
+        if self.embedding is None:
+            return self._rank_by_keywords(query, k)
+        with stage_timer("embed"):
+            vector = self.embedding.embed_query(query)
+        return self._rank_by_vector(vector, k)
+
+    async def aretrieve(self, query: str, k: int = 5, **kwargs) -> list[Document]:
+        """Asynchronous mock retrieval, the delay does not hold a worker thread."""
+        if self.delay > 0:
+            await asyncio.sleep(self.delay)
+
+        if self.embedding is None:
+            return self._rank_by_keywords(query, k)
+        with stage_timer("embed"):
+            vector = await self.embedding.aembed_query(query)
+        return self._rank_by_vector(vector, k)
+
+    @staticmethod
+    def _scored(scored_docs: list[tuple[Document, float]], k: int) -> list[Document]:
+        scored_docs.sort(key=lambda x: x[1], reverse=True)
+        return [
+            Document(page_content=doc.page_content, metadata=doc.metadata | {"score": float(score)})
+            for doc, score in scored_docs[:k]
+        ]
+
+    def _rank_by_vector(self, vector: list[float], k: int) -> list[Document]:
+        with stage_timer("vector_search"):
+            query_vector = np.asarray(vector) / (np.linalg.norm(vector) or 1.0)
+            scores = (self._matrix @ query_vector + 1.0) / 2.0
+            return self._scored(list(zip(self.mock_documents, scores, strict=True)), k)
+
+    def _rank_by_keywords(self, query: str, k: int) -> list[Document]:
         query_words = set(query.lower().split())
         scored_docs = []
 
@@ -72,5 +145,4 @@ class MockBaseRetriever(BaseRetriever):
             score = overlap / max(len(query_words), 1)
             scored_docs.append((doc, score))
 
-        scored_docs.sort(key=lambda x: x[1], reverse=True)
-        return [doc for doc, _ in scored_docs[:k]]
+        return self._scored(scored_docs, k)
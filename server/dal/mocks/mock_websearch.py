@@ -1,11 +1,12 @@
+import asyncio
 import random
 import time
 
-from core.interfaces import WebSearchRetriever
-from langchain.schema import Document
+from core.interfaces import BaseRetriever
+from langchain_core.documents import Document
 
 
-class MockWebSearchRetriever(WebSearchRetriever):
+class MockWebSearchRetriever(BaseRetriever):
     """
     Mock web search retriever for testing and development.
     Simulates web search with predefined responses.
@@ -77,7 +78,7 @@ class MockWebSearchRetriever(WebSearchRetriever):
             ),
         ]
 
-    def search(self, query: str, k: int = 3, **kwargs) -> list[Document]:
+    def retrieve(self, query: str, k: int = 3, **kwargs) -> list[Document]:
         """
         Mock web search with simple keyword matching.
 
@@ -92,7 +93,15 @@ class MockWebSearchRetriever(WebSearchRetriever):
         # Simulate network delay
         if self.delay > 0:
             time.sleep(self.delay)
+        return self._search(query, k)
 
+    async def aretrieve(self, query: str, k: int = 3, **kwargs) -> list[Document]:
+        """Asynchronous mock web search, the delay does not hold a worker thread."""
+        if self.delay > 0:
+            await asyncio.sleep(self.delay)
+        return self._search(query, k)
+
+    def _search(self, query: str, k: int) -> list[Document]:
         # Simple keyword-based filtering for more realistic behavior
         query_words = set(query.lower().split())
         scored_results = []
@@ -112,7 +121,11 @@ class MockWebSearchRetriever(WebSearchRetriever):
         scored_results.sort(key=lambda x: x[1], reverse=True)
 
         # Add some randomness to make it more realistic
-        results = [doc for doc, _ in scored_results[:k]]
+        max_score = max((score for _, score in scored_results), default=0) or 1
+        results = [
+            Document(page_content=doc.page_content, metadata=doc.metadata | {"score": 0.5 + 0.5 * score / max_score})
+            for doc, score in scored_results[:k]
+        ]
 
         # Simulate slight randomization in results order
         if len(results) > 1 and random.random() > 0.7:
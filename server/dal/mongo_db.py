@@ -1,22 +1,74 @@
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
 import numpy as np
+import pymongo
 from core.config.config import config
 from core.interfaces import BaseRetriever
 from core.logger import logger
-from core.utils.components import get_embedding
-from langchain.schema import Document
+from core.utils.components import embed_queries, get_embedding
+from core.utils.metrics import stage_timer
+from core.utils.ttl_cache import TTLCache
+from dal.cutoff_strategies import get_cutoff_strategy
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_mongodb.pipelines import vector_search_stage
+from langchain_mongodb.utils import make_serializable
 from langchain_mongodb.vectorstores import MongoDBAtlasVectorSearch
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient, MongoClient
 from pymongo.collection import Collection
 from pymongo.database import Database
+from pymongo.errors import PyMongoError
+
+
+class _LazyClient:
+    """Class attribute creating its client on first access, so importing this module does not connect."""
+
+    def __init__(self, factory: Callable[[], Any]):
+        self.factory = factory
+        self.instance = None
+        self._lock = threading.Lock()
+
+    def __get__(self, obj, owner) -> Any:
+        if self.instance is None:
+            with self._lock:
+                if self.instance is None:
+                    self.instance = self.factory()
+        return self.instance
 
 
 class MongoDB:
-    client: MongoClient = MongoClient(config.mongo.URI, connect=True)
+    client: MongoClient = _LazyClient(lambda: MongoClient(config.mongo.URI, connect=True))
+    async_client: AsyncMongoClient = _LazyClient(
+        lambda: AsyncMongoClient(
+            config.mongo.URI,
+            maxPoolSize=config.mongo.ASYNC_MAX_POOL_SIZE,
+            minPoolSize=config.mongo.ASYNC_MIN_POOL_SIZE,
+            waitQueueTimeoutMS=config.mongo.ASYNC_WAIT_QUEUE_TIMEOUT_MS,
+        )
+    )
+
+    @classmethod
+    def connect(cls) -> tuple[MongoClient, AsyncMongoClient]:
+        """Create both clients and check the connection."""
+        cls.client.admin.command("ping")
+        return cls.client, cls.async_client
 
     @classmethod
     def close(cls) -> None:
         """Close the MongoDB connection."""
-        cls.client.close()
+        if cls.__dict__["client"].instance is not None:
+            cls.client.close()
+
+    @classmethod
+    async def aclose(cls) -> None:
+        """Close both the synchronous and the asynchronous MongoDB connections."""
+        cls.close()
+        if cls.__dict__["async_client"].instance is not None:
+            await cls.async_client.close()
 
 
 def get_db_client(db_name: str) -> Database:
@@ -36,7 +88,74 @@ def get_collection(db_name: str, collection_name: str) -> Collection:
         raise Exception("Collection with '{db_name}' name does not exists in the {db_name} database!")
 
 
-class MongoRetriever(BaseRetriever):
+def get_collection_fingerprint(db_name: str, collection_name: str) -> tuple[int, str | None]:
+    """Cheap fingerprint of a collection (document count and newest _id) used to detect re-ingestion."""
+    collection = MongoDB.client[db_name][collection_name]
+    latest = collection.find_one({}, projection={"_id": 1}, sort=[("_id", -1)])
+    return collection.estimated_document_count(), str(latest["_id"]) if latest else None
+
+
+class CachedQueryEmbedding(ABC):
+    """
+    Mixin embedding each query once behind an LRU cache with TTL, keyed on the normalized query and model name.
+
+    Used by the retrievers that embed their own queries, they provide the embedding model through
+    `query_embedding_model` and create the cache with `new_embedding_cache`.
+    """
+
+    embedding_cache: TTLCache[list[float]]
+
+    @property
+    @abstractmethod
+    def query_embedding_model(self) -> Embeddings:
+        """Model embedding the queries, provided by the retriever."""
+        ...
+
+    @staticmethod
+    def new_embedding_cache() -> TTLCache[list[float]]:
+        return TTLCache(
+            max_size=config.mongo.EMBEDDING_CACHE_SIZE, ttl_seconds=config.mongo.EMBEDDING_CACHE_TTL_SECONDS
+        )
+
+    @staticmethod
+    def embedding_cache_key(query: str) -> tuple[str, str]:
+        """Collapse whitespace and casefold so trivially different queries share an entry."""
+        return " ".join(query.split()).casefold(), config.embedding
+
+    def embed_query(self, query: str) -> list[float]:
+        """Embed the query once, serving repeated queries from the embedding cache."""
+        with stage_timer("embed"):
+            vector = self.embedding_cache.get(self.embedding_cache_key(query))
+            if vector is None:
+                vector = self.query_embedding_model.embed_query(query)
+                self.embedding_cache.put(self.embedding_cache_key(query), vector)
+        return vector
+
+    async def aembed_query(self, query: str) -> list[float]:
+        """Asynchronous counterpart of embed_query."""
+        with stage_timer("embed"):
+            vector = self.embedding_cache.get(self.embedding_cache_key(query))
+            if vector is None:
+                vector = await self.query_embedding_model.aembed_query(query)
+                self.embedding_cache.put(self.embedding_cache_key(query), vector)
+        return vector
+
+    async def aprime_query_embeddings(self, queries: list[str]) -> None:
+        """Embed the uncached queries with one batched call so that later embed_query calls hit the cache."""
+        missing = list(
+            dict.fromkeys(
+                query for query in queries if self.embedding_cache.get(self.embedding_cache_key(query)) is None
+            )
+        )
+        if not missing:
+            return
+        with stage_timer("embed_batch"):
+            vectors = await asyncio.to_thread(embed_queries, self.query_embedding_model, missing)
+        for query, vector in zip(missing, vectors, strict=True):
+            self.embedding_cache.put(self.embedding_cache_key(query), vector)
+
+
+class MongoRetriever(CachedQueryEmbedding, BaseRetriever):
     """MongoDB Atlas Vector Search implementation of BaseRetriever interface."""
 
     def __init__(self, collection_name: str, top_k: int = 5, relevance_tolerance: float = 0.4):
@@ -45,38 +164,137 @@ class MongoRetriever(BaseRetriever):
         self.collection_name = collection_name
         self.relevance_tolerance = relevance_tolerance
         self.vector_store = self.get_retriever(collection_name)
+        self.embedding_cache = self.new_embedding_cache()
+        self.cutoff_strategy = get_cutoff_strategy(config.mongo.CUTOFF_STRATEGY)
+
+    @property
+    def query_embedding_model(self) -> Embeddings:
+        return self.vector_store._embedding
+
+    def _relevance_pipeline(self, threshold: float) -> list[dict]:
+        return [
+            {"$addFields": {"relevance_score": {"$meta": "vectorSearchScore"}}},
+            {"$match": {"relevance_score": {"$gte": threshold}}},
+        ]
+
+    @staticmethod
+    @contextmanager
+    def _search_timeout(timeout: float | None) -> Iterator[None]:
+        """Bound the Mongo operations of the block by `timeout` seconds, surfacing expiry as TimeoutError."""
+        try:
+            with pymongo.timeout(timeout):
+                yield
+        except PyMongoError as e:
+            if e.timeout:
+                raise TimeoutError(f"Vector search exceeded {timeout:.2f}s") from e
+            raise
+
+    def _apply_cutoff(self, candidates: list[tuple[Document, float]]) -> list[Document]:
+        """Keep the number of top candidates chosen by the configured cutoff strategy."""
+        if not candidates:
+            return []
+
+        scores = np.fromiter((score for _, score in candidates), dtype=np.float64, count=len(candidates))
+        top_k = self.cutoff_strategy(scores)
+        for doc, score in candidates[:top_k]:
+            doc.metadata["score"] = score
+        return [doc for doc, _ in candidates[:top_k]]
 
     def retrieve(self, query: str, k: int = 5, **kwargs) -> list[Document]:
-        """Implement BaseRetriever interface method."""
+        """
+        Implement BaseRetriever interface method.
+
+        Supported kwargs: `auto_k` to choose k with the cutoff strategy, `candidate_limit` to override the
+        auto-k candidate count and `timeout` to bound the vector search in seconds.
+        """
 
         if "auto_k" in kwargs and kwargs["auto_k"]:
             return self.retrieve_auto_k(query, **kwargs)
 
-        pipeline = [
-            {"$addFields": {"relevance_score": {"$meta": "vectorSearchScore"}}},
-            {"$match": {"relevance_score": {"$gte": self.relevance_tolerance}}},
-        ]
-
-        self.get_all_similarity_scores(query)
-        return self.vector_store.similarity_search(query, k=k, post_filter_pipeline=pipeline)
+        embedding_vector = self.embed_query(query)
+        with stage_timer("vector_search"), self._search_timeout(kwargs.get("timeout")):
+            candidates = self.vector_store._similarity_search_with_score(
+                embedding_vector, k=k, post_filter_pipeline=self._relevance_pipeline(self.relevance_tolerance)
+            )
+        for doc, score in candidates:
+            doc.metadata["score"] = score
+        return [doc for doc, _ in candidates]
 
     def retrieve_auto_k(self, query: str, **kwargs) -> list[Document]:
         """Retrieve documents with automatic k based on relevance tolerance."""
 
-        all_score = np.array([doc["similarity_score"] for doc in self.get_all_similarity_scores(query)])
-        normalized_scores = (all_score - all_score.min()) / (all_score.max() - all_score.min() + 1e-10)
-        high_scores = [s for s in normalized_scores if s > 0.90]
-        top_k = min(15, max(3, len(high_scores)))
-        return self.vector_store.similarity_search(query, k=top_k)
+        embedding_vector = self.embed_query(query)
+        with stage_timer("vector_search"), self._search_timeout(kwargs.get("timeout")):
+            candidates = self.vector_store._similarity_search_with_score(
+                embedding_vector,
+                k=kwargs.get("candidate_limit") or config.mongo.AUTO_K_CANDIDATE_LIMIT,
+                oversampling_factor=config.mongo.AUTO_K_OVERSAMPLING_FACTOR,
+            )
+        return self._apply_cutoff(candidates)
 
-    def retrieve_with_scores(self, query: str, k: int = 5, **kwargs) -> list[tuple[Document, float]]:
-        """Retrieve documents with their similarity scores."""
+    async def aretrieve(self, query: str, k: int = 5, **kwargs) -> list[Document]:
+        """Native asynchronous retrieval on the pooled async Mongo client, supporting the kwargs of retrieve."""
+        embedding_vector = await self.aembed_query(query)
+
+        if "auto_k" in kwargs and kwargs["auto_k"]:
+            with self._search_timeout(kwargs.get("timeout")):
+                candidates = await self._asimilarity_search_with_score(
+                    embedding_vector,
+                    k=kwargs.get("candidate_limit") or config.mongo.AUTO_K_CANDIDATE_LIMIT,
+                    oversampling_factor=config.mongo.AUTO_K_OVERSAMPLING_FACTOR,
+                )
+            return self._apply_cutoff(candidates)
+
+        with self._search_timeout(kwargs.get("timeout")):
+            candidates = await self._asimilarity_search_with_score(
+                embedding_vector, k=k, post_filter_pipeline=self._relevance_pipeline(self.relevance_tolerance)
+            )
+        for doc, score in candidates:
+            doc.metadata["score"] = score
+        return [doc for doc, _ in candidates]
+
+    async def _asimilarity_search_with_score(
+        self,
+        embedding_vector: list[float],
+        k: int,
+        post_filter_pipeline: list[dict] | None = None,
+        oversampling_factor: int = 10,
+    ) -> list[tuple[Document, float]]:
+        """Async mirror of MongoDBAtlasVectorSearch._similarity_search_with_score."""
+        text_key = self.vector_store._text_key
+        embedding_key = self.vector_store._embedding_key
         pipeline = [
-            {"$addFields": {"relevance_score": {"$meta": "vectorSearchScore"}}},
-            {"$match": {"relevance_score": {"$gte": self.relevance_tolerance}}},
+            vector_search_stage(
+                embedding_vector,
+                embedding_key,
+                config.mongo.VECTOR_SRACH_INDEX_NAME,
+                k,
+                oversampling_factor=oversampling_factor,
+            ),
+            {"$set": {"score": {"$meta": "vectorSearchScore"}}},
+            {"$project": {embedding_key: 0}},
         ]
+        if post_filter_pipeline is not None:
+            pipeline.extend(post_filter_pipeline)
+
+        collection = MongoDB.async_client[config.mongo.DB_NAME][self.collection_name]
+        docs = []
+        with stage_timer("vector_search"):
+            async for res in await collection.aggregate(pipeline):
+                if text_key not in res:
+                    continue
+                text = res.pop(text_key)
+                score = res.pop("score")
+                make_serializable(res)
+                docs.append((Document(page_content=text, metadata=res), score))
+        return docs
 
-        return self.vector_store.similarity_search_with_score(query, k=k, post_filter_pipeline=pipeline)
+    def retrieve_with_scores(self, query: str, k: int = 5, **kwargs) -> list[tuple[Document, float]]:
+        """Retrieve documents with their similarity scores."""
+        embedding_vector = self.embed_query(query)
+        return self.vector_store._similarity_search_with_score(
+            embedding_vector, k=k, post_filter_pipeline=self._relevance_pipeline(self.relevance_tolerance)
+        )
 
     def retrieve_all_with_scores(
         self, query: str, score_threshold: float = None, **kwargs
@@ -86,18 +304,13 @@ class MongoRetriever(BaseRetriever):
 
         large_k = kwargs.get("max_results", 10000)  # Adjust based on your collection size
 
-        pipeline = [
-            {"$addFields": {"relevance_score": {"$meta": "vectorSearchScore"}}},
-            {"$match": {"relevance_score": {"$gte": threshold}}},
-        ]
-        return self.vector_store.similarity_search_with_score(query, k=large_k, post_filter_pipeline=pipeline)
-
-    def get_all_similarity_scores(self, query: str) -> list[dict]:
-        """Get all similarity scores with document IDs."""
-        import time
+        embedding_vector = self.embed_query(query)
+        return self.vector_store._similarity_search_with_score(
+            embedding_vector, k=large_k, post_filter_pipeline=self._relevance_pipeline(threshold)
+        )
 
-        t0 = time.perf_counter()
-        embedding_vector = self.vector_store._embedding.embed_query(query)
+    def get_all_similarity_scores(self, embedding_vector: list[float]) -> list[dict]:
+        """Get all similarity scores with document IDs for an already embedded query."""
         pipeline = [
             {
                 "$vectorSearch": {
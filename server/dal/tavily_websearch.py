@@ -1,30 +1,439 @@
+import asyncio
+import hashlib
+import json
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from functools import cached_property
+
+import httpx
+import numpy as np
 from core.config.config import config
 from core.interfaces import BaseRetriever
+from core.logger import logger
+from core.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from core.utils.metrics import registry
 from langchain_core.documents import Document
-from tavily import TavilyClient
+
+WEB_SEARCH_REQUESTS = registry.counter(
+    "assistant_web_search_requests_total",
+    "Tavily searches by outcome: success, timeout, error or rejected by the open circuit breaker.",
+    labelnames=("outcome",),
+)
+WEB_SEARCH_HEDGES = registry.counter(
+    "assistant_web_search_hedges_total",
+    "Hedged Tavily requests: sent after the p95-based delay, and won when the hedge answered first.",
+    labelnames=("outcome",),
+)
+WEB_CACHE_LOOKUPS = registry.counter(
+    "assistant_web_search_cache_lookups_total",
+    "Web search cache lookups by result: fresh hit, stale hit (served while refreshing) or miss.",
+    labelnames=("result",),
+)
+WEB_CACHE_SAVED_SECONDS = registry.counter(
+    "assistant_web_search_cache_saved_seconds_total",
+    "Tavily latency saved by the web search cache, the latency of the cached search per hit.",
+)
+
+
+class WebSearchCache:
+    """
+    Two-level cache of web search results with a TTL and a stale-while-revalidate window.
+
+    An in-memory LRU sits in front of an optional SQLite store that survives restarts and is shared by
+    the workers of a host. Entries younger than `ttl_seconds` are fresh, entries up to `stale_seconds`
+    older than that are still served but should be refreshed by the caller. Timestamps are wall-clock
+    so that persisted entries keep their age across restarts.
+
+    Only the in-memory LRU is touched on the event loop: `aget` reads SQLite in a worker thread on a
+    memory miss, and writes are persisted by a writer thread that commits them in batches.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl_seconds: float = 24 * 3600.0,
+        stale_seconds: float = 6 * 24 * 3600.0,
+        db_path: str | None = None,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            max_size: Maximum number of entries kept in memory
+            ttl_seconds: Age until which an entry is fresh
+            stale_seconds: How long after the TTL an entry is still served while being refreshed
+            db_path: SQLite file of the on-disk store, None keeps the cache in memory only
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._entries: OrderedDict[str, tuple[float, float, list[dict]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+        self._db_lock = threading.Lock()
+        self._writes: queue.SimpleQueue[tuple | None] = queue.SimpleQueue()
+        self._writer: threading.Thread | None = None
+        if db_path:
+            self._db = self._open(db_path)
+            self._writer = threading.Thread(target=self._write_loop, name="web-search-cache-writer", daemon=True)
+            self._writer.start()
+
+    def _open(self, db_path: str) -> sqlite3.Connection:
+        db = sqlite3.connect(db_path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS web_search_cache "
+            "(key TEXT PRIMARY KEY, stored_at REAL NOT NULL, latency REAL NOT NULL, results TEXT NOT NULL)"
+        )
+        db.execute(
+            "DELETE FROM web_search_cache WHERE stored_at < ?",
+            (time.time() - self.ttl_seconds - self.stale_seconds,),
+        )
+        db.commit()
+        return db
+
+    @staticmethod
+    def key(query: str, k: int, include_domains, exclude_domains, **kwargs) -> str:
+        """Hash of everything that changes the search results, the transport timeout excluded."""
+        kwargs.pop("timeout", None)
+        payload = {
+            "query": " ".join(query.split()).casefold(),
+            "k": k,
+            "include_domains": sorted(include_domains or []),
+            "exclude_domains": sorted(exclude_domains or []),
+            "kwargs": kwargs,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _load(self, key: str) -> tuple[float, float, list[dict]] | None:
+        if self._db is None:
+            return None
+        try:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT stored_at, latency, results FROM web_search_cache WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read the web search cache: {e}")
+            return None
+        return None if row is None else (row[0], row[1], json.loads(row[2]))
+
+    def _write_loop(self) -> None:
+        """Persist the queued entries until close, committing once per batch."""
+        while True:
+            batch = [self._writes.get()]
+            while True:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            rows = []
+            for key, stored_at, latency, results in filter(None, batch):
+                try:
+                    rows.append((key, stored_at, latency, json.dumps(results)))
+                except (TypeError, ValueError) as e:
+                    logger.warning(f"Failed to serialize web search results for the cache: {e}")
+            try:
+                with self._db_lock:
+                    self._db.executemany("INSERT OR REPLACE INTO web_search_cache VALUES (?, ?, ?, ?)", rows)
+                    self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to write the web search cache: {e}")
+            if None in batch:
+                return
+
+    def get(self, key: str) -> tuple[list[dict], bool] | None:
+        """
+        Look up cached search results.
+
+        Returns:
+            The results and whether they are fresh, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        return self._lookup(key, entry or self._load(key))
+
+    async def aget(self, key: str) -> tuple[list[dict], bool] | None:
+        """Asynchronous counterpart of get, reading the on-disk store in a worker thread."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None and self._db is not None:
+            entry = await asyncio.to_thread(self._load, key)
+        return self._lookup(key, entry)
+
+    def _lookup(self, key: str, entry: tuple[float, float, list[dict]] | None) -> tuple[list[dict], bool] | None:
+        with self._lock:
+            age = time.time() - entry[0] if entry is not None else None
+            if age is None or age > self.ttl_seconds + self.stale_seconds:
+                self._entries.pop(key, None)
+                self.misses += 1
+                WEB_CACHE_LOOKUPS.inc(result="miss")
+                return None
+
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+            fresh = age <= self.ttl_seconds
+            if fresh:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+            self.saved_seconds += entry[1]
+        WEB_CACHE_LOOKUPS.inc(result="hit" if fresh else "stale")
+        WEB_CACHE_SAVED_SECONDS.inc(entry[1])
+        return entry[2], fresh
+
+    def put(self, key: str, results: list[dict], latency_seconds: float) -> None:
+        """Cache the results of a search that took `latency_seconds`."""
+        entry = (time.time(), latency_seconds, results)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        if self._writer is not None:
+            self._writes.put((key, *entry))
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Persist the queued entries and stop the writer thread."""
+        if self._writer is None or not self._writer.is_alive():
+            return
+        self._writes.put(None)
+        self._writer.join(timeout=timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.stale_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits + self.stale_hits) / total if total else 0.0,
+                "saved_seconds": round(self.saved_seconds, 3),
+            }
 
 
 class TavilyRetriever(BaseRetriever):
+    """
+    Tavily search over pooled HTTP connections, with a result cache, hedging and a circuit breaker.
+
+    Every search is bounded by `timeout_seconds` (or the shorter timeout passed by the caller). When a
+    search has not answered after the `hedge_quantile` latency of the recent searches, a second identical
+    request is sent and the first answer wins. Failed, timed out and slow searches feed the circuit
+    breaker, and while it is open searches raise CircuitOpenError immediately, cached results excepted.
+    """
+
     def __init__(
         self,
         include_domains: list[str] | None = None,
         exclude_domains: list[str] | None = None,
         relevance_tolerance: float = 0.4,
+        cache: WebSearchCache | None = None,
+        timeout_seconds: float = 5.0,
+        hedge_quantile: float | None = 0.95,
+        circuit_breaker: CircuitBreaker | None = None,
     ):
+        """
+        Initialize the Tavily retriever, the HTTP clients are created on first use.
+
+        Args:
+            include_domains: Domains the search is restricted to
+            exclude_domains: Domains excluded from the search
+            relevance_tolerance: Minimum Tavily score of a returned document
+            cache: Optional result cache
+            timeout_seconds: Maximum duration of a search, hedge included
+            hedge_quantile: Latency quantile after which a hedged request is sent, None disables hedging
+            circuit_breaker: Breaker protecting the Tavily API, defaults to one configured from Tavily config
+        """
         self.include_domains = include_domains
         self.exclude_domains = exclude_domains
-        self.client = TavilyClient(api_key=config.tavily.API_KEY)
         self.relevance_tolerance = relevance_tolerance
-
-    def retrieve(self, query: str, k: int = 3, **kwargs) -> list[Document]:
-        response = self.client.search(
-            query=query,
-            max_results=k,
-            include_domains=self.include_domains,
-            exclude_domains=self.exclude_domains,
-            **kwargs,
+        self.cache = cache
+        self.timeout_seconds = timeout_seconds
+        self.hedge_quantile = hedge_quantile
+        self.circuit_breaker = circuit_breaker or CircuitBreaker(
+            "tavily",
+            failure_threshold=config.tavily.BREAKER_FAILURE_THRESHOLD,
+            slow_call_seconds=config.tavily.BREAKER_SLOW_CALL_SECONDS,
+            cool_down_seconds=config.tavily.BREAKER_COOL_DOWN_SECONDS,
         )
+        self._latencies: deque[float] = deque(maxlen=config.tavily.HEDGE_WINDOW)
+        self._refreshing: set[str] = set()
+        self._refreshing_lock = threading.Lock()
+        self._refresh_tasks: set[asyncio.Task] = set()
+
+    def _client_kwargs(self) -> dict:
+        return {
+            "base_url": config.tavily.BASE_URL,
+            "headers": {"Content-Type": "application/json", "Authorization": f"Bearer {config.tavily.API_KEY}"},
+            "limits": httpx.Limits(
+                max_connections=config.tavily.MAX_CONNECTIONS,
+                max_keepalive_connections=config.tavily.MAX_CONNECTIONS,
+                keepalive_expiry=config.tavily.KEEPALIVE_EXPIRY_SECONDS,
+            ),
+        }
+
+    @cached_property
+    def client(self) -> httpx.Client:
+        return httpx.Client(**self._client_kwargs())
+
+    @cached_property
+    def async_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(**self._client_kwargs())
+
+    def _request(self, query: str, k: int, kwargs: dict) -> tuple[dict, float]:
+        """The search payload and its timeout, never longer than `timeout_seconds`."""
+        timeout = min(kwargs.pop("timeout", None) or self.timeout_seconds, self.timeout_seconds)
+        payload = {
+            "query": query,
+            "max_results": k,
+            "include_domains": self.include_domains,
+            "exclude_domains": self.exclude_domains,
+        } | kwargs
+        return {key: value for key, value in payload.items() if value is not None}, timeout
+
+    def _permit(self) -> None:
+        if not self.circuit_breaker.allow():
+            WEB_SEARCH_REQUESTS.inc(outcome="rejected")
+            raise CircuitOpenError("Tavily circuit breaker is open")
+
+    def _succeeded(self, key: str | None, response: dict, start: float) -> list[dict]:
+        seconds = time.perf_counter() - start
+        self._latencies.append(seconds)
+        self.circuit_breaker.record_success(seconds)
+        WEB_SEARCH_REQUESTS.inc(outcome="success")
         results = response.get("results", [])
+        if key is not None:
+            self.cache.put(key, results, seconds)
+        return results
+
+    def _failed(self, outcome: str, error: Exception) -> None:
+        self.circuit_breaker.record_failure()
+        WEB_SEARCH_REQUESTS.inc(outcome=outcome)
+        logger.warning(f"Tavily search failed ({outcome}): {error}")
+
+    def _search(self, key: str | None, query: str, k: int, **kwargs) -> list[dict]:
+        payload, timeout = self._request(query, k, kwargs)
+        self._permit()
+        start = time.perf_counter()
+        try:
+            response = self.client.post("/search", json=payload, timeout=timeout)
+            response.raise_for_status()
+        except httpx.TimeoutException as e:
+            self._failed("timeout", e)
+            raise TimeoutError(f"Tavily search timed out after {timeout}s") from e
+        except Exception as e:
+            self._failed("error", e)
+            raise
+        return self._succeeded(key, response.json(), start)
+
+    def _hedge_delay(self) -> float | None:
+        """The hedge_quantile of the recent search latencies, None until enough searches were seen."""
+        if self.hedge_quantile is None or len(self._latencies) < config.tavily.HEDGE_MIN_SAMPLES:
+            return None
+        return max(config.tavily.HEDGE_MIN_DELAY_SECONDS, float(np.quantile(self._latencies, self.hedge_quantile)))
+
+    async def _apost(self, payload: dict, timeout: float) -> dict:
+        response = await self.async_client.post("/search", json=payload, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+    async def _ahedged_post(self, payload: dict, timeout: float) -> dict:
+        """Send the search, and a second identical one when the first is slower than the hedge delay."""
+        tasks = [asyncio.create_task(self._apost(payload, timeout))]
+        try:
+            delay = self._hedge_delay()
+            if delay is None or delay >= timeout:
+                return await tasks[0]
+
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                WEB_SEARCH_HEDGES.inc(outcome="sent")
+                tasks.append(asyncio.create_task(self._apost(payload, timeout - delay)))
+
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not tasks[0]:
+                            WEB_SEARCH_HEDGES.inc(outcome="won")
+                        return task.result()
+            return tasks[0].result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _asearch(self, key: str | None, query: str, k: int, **kwargs) -> list[dict]:
+        payload, timeout = self._request(query, k, kwargs)
+        self._permit()
+        start = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(self._ahedged_post(payload, timeout), timeout)
+        except (TimeoutError, httpx.TimeoutException) as e:
+            self._failed("timeout", e)
+            raise TimeoutError(f"Tavily search timed out after {timeout}s") from e
+        except asyncio.CancelledError:
+            self.circuit_breaker.release()
+            raise
+        except Exception as e:
+            self._failed("error", e)
+            raise
+        return self._succeeded(key, response, start)
+
+    def _claim_refresh(self, key: str) -> bool:
+        """Claim the refresh of a stale entry, so it is refreshed once however many requests hit it."""
+        with self._refreshing_lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def _release_refresh(self, key: str) -> None:
+        with self._refreshing_lock:
+            self._refreshing.discard(key)
+
+    def _refresh_in_background(self, key: str, query: str, k: int, **kwargs) -> None:
+        if not self._claim_refresh(key):
+            return
+
+        def refresh():
+            try:
+                self._search(key, query, k, **kwargs)
+            except Exception as e:
+                logger.debug(f"Failed to refresh cached web search: {e}")
+            finally:
+                self._release_refresh(key)
+
+        threading.Thread(target=refresh, name="web-search-refresh", daemon=True).start()
+
+    def _arefresh_in_background(self, key: str, query: str, k: int, **kwargs) -> None:
+        if not self._claim_refresh(key):
+            return
+
+        async def refresh():
+            try:
+                await self._asearch(key, query, k, **kwargs)
+            except Exception as e:
+                logger.debug(f"Failed to refresh cached web search: {e}")
+            finally:
+                self._release_refresh(key)
+
+        task = asyncio.create_task(refresh())
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    def _to_documents(self, results: list[dict]) -> list[Document]:
         docs: list[Document] = []
         for item in results:
             content = item.get("content", "")
@@ -36,3 +445,44 @@ class TavilyRetriever(BaseRetriever):
                 docs.append(Document(page_content=content, metadata=metadata))
 
         return docs
+
+    def retrieve(self, query: str, k: int = 3, **kwargs) -> list[Document]:
+        if self.cache is None:
+            return self._to_documents(self._search(None, query, k, **kwargs))
+
+        key = self.cache.key(query, k, self.include_domains, self.exclude_domains, **kwargs)
+        cached = self.cache.get(key)
+        if cached is None:
+            return self._to_documents(self._search(key, query, k, **kwargs))
+
+        results, fresh = cached
+        if not fresh:
+            self._refresh_in_background(key, query, k, **kwargs)
+        return self._to_documents(results)
+
+    async def aretrieve(self, query: str, k: int = 3, **kwargs) -> list[Document]:
+        """Asynchronous counterpart of retrieve, hedged and on the pooled async client."""
+        if self.cache is None:
+            return self._to_documents(await self._asearch(None, query, k, **kwargs))
+
+        key = self.cache.key(query, k, self.include_domains, self.exclude_domains, **kwargs)
+        cached = await self.cache.aget(key)
+        if cached is None:
+            return self._to_documents(await self._asearch(key, query, k, **kwargs))
+
+        results, fresh = cached
+        if not fresh:
+            self._arefresh_in_background(key, query, k, **kwargs)
+        return self._to_documents(results)
+
+    async def awarm_up(self) -> None:
+        """Open a pooled connection to the API, without spending search credits."""
+        await self.async_client.get("/", timeout=self.timeout_seconds)
+
+    async def aclose(self) -> None:
+        if "client" in self.__dict__:
+            self.client.close()
+        if "async_client" in self.__dict__:
+            await self.async_client.aclose()
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.close)
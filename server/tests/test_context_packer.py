@@ -0,0 +1,59 @@
+from bll.agents.knowledge_agent.context_packer import ContextPacker
+from bson import ObjectId
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+PAGE = "\n\n".join(
+    f"Section {i}. The assistant answers questions about the internal regulations. "
+    f"Rule {i} describes how requests are filed, who approves them and how long approval takes."
+    for i in range(12)
+)
+
+
+def _ingested_chunks() -> list[Document]:
+    """Chunks of one page shaped like ingestion stores them and the retrievers return them."""
+    splitter = RecursiveCharacterTextSplitter(
+        separators=["\n\n", "\n", ".", "?", "!", " ", ""], chunk_size=800, chunk_overlap=0, add_start_index=True
+    )
+    page = Document(
+        page_content=PAGE,
+        metadata={"source": "rules.pdf", "title": "Rules", "page_number": 3, "page_count": 10, "description": ""},
+    )
+    chunks = splitter.split_documents([page])
+    for chunk in chunks:
+        chunk.metadata["_id"] = str(ObjectId())
+    return chunks
+
+
+def test_contiguous_chunks_merge_in_reading_order():
+    chunks = _ingested_chunks()
+    assert len(chunks) >= 3
+    for chunk, score in zip(chunks, [0.7, 0.9, 0.8], strict=False):
+        chunk.metadata["score"] = score
+
+    blocks, stats = ContextPacker().pack(chunks[:3], [])
+
+    assert stats["blocks"] == 1
+    assert [doc.metadata["start_index"] for doc in blocks[0].documents] == [
+        chunk.metadata["start_index"] for chunk in chunks[:3]
+    ]
+    assert blocks[0].score == 0.9
+    assert blocks[0].text.startswith("Section 0.")
+    assert " ".join(blocks[0].text.split()) in " ".join(PAGE.split())
+
+
+def test_chunks_with_a_gap_stay_separate():
+    chunks = _ingested_chunks()
+    blocks, stats = ContextPacker().pack([chunks[0], chunks[2]], [])
+
+    assert stats["blocks"] == 2
+
+
+def test_chunks_without_start_index_are_not_merged():
+    chunks = _ingested_chunks()[:3]
+    for chunk in chunks:
+        del chunk.metadata["start_index"]
+
+    blocks, stats = ContextPacker().pack(chunks, [])
+
+    assert stats["blocks"] == 3
@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+from core.config.config import config
+from dal.cutoff_strategies import get_cutoff_strategy, largest_gap_cutoff
+
+
+@pytest.mark.parametrize(("min_k", "expected"), [(0, 2), (1, 2), (3, 4)])
+def test_largest_gap_cuts_at_the_largest_drop_past_min_k(min_k, expected):
+    scores = np.array([0.95, 0.94, 0.70, 0.69, 0.50])
+
+    assert largest_gap_cutoff(scores, min_k=min_k, max_k=5) == expected
+
+
+def test_largest_gap_keeps_short_candidate_lists():
+    assert largest_gap_cutoff(np.array([0.9, 0.1]), min_k=3) == 2
+
+
+def test_min_k_below_one_is_rejected(monkeypatch):
+    monkeypatch.setattr(config.mongo, "CUTOFF_MIN_K", 0)
+
+    with pytest.raises(ValueError, match="CUTOFF_MIN_K"):
+        get_cutoff_strategy("largest_gap")
@@ -0,0 +1,122 @@
+import mongomock
+import pytest
+from dal.local_vector_index import LocalVectorIndex
+from langchain_core.embeddings import Embeddings
+
+VECTORS = {"red": [1.0, 0.0, 0.0], "green": [0.0, 1.0, 0.0], "blue": [0.0, 0.0, 1.0]}
+
+
+class ColorEmbeddings(Embeddings):
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return VECTORS[text]
+
+
+@pytest.fixture
+def collection():
+    collection = mongomock.MongoClient().assistant.knowledge
+    collection.insert_many(
+        [{"text": f"{color} chunk", "embedding": vector, "source": f"{color}.pdf"} for color, vector in VECTORS.items()]
+    )
+    return collection
+
+
+@pytest.fixture
+def index(collection):
+    index = LocalVectorIndex(collection, ColorEmbeddings(), relevance_tolerance=0.9, auto_refresh=False)
+    yield index
+    index.close()
+
+
+def test_load_skips_documents_without_embedding(collection):
+    collection.insert_one({"text": "no embedding"})
+
+    index = LocalVectorIndex(collection, ColorEmbeddings(), auto_refresh=False)
+
+    assert len(index) == 3
+    assert all(isinstance(doc.metadata["_id"], str) for doc in index._documents)
+
+
+def test_search_ranks_by_cosine_score(index):
+    results = index.search_by_vector([0.0, 2.0, 0.1], k=2)
+
+    assert [doc.page_content for doc, _ in results] == ["green chunk", "blue chunk"]
+    assert results[0][1] == pytest.approx(results[0][0].metadata["score"])
+    assert results[0][1] > results[1][1]
+
+
+def test_retrieve_applies_relevance_tolerance(index):
+    documents = index.retrieve("red", k=3)
+
+    assert [doc.page_content for doc in documents] == ["red chunk"]
+    assert documents[0].metadata["source"] == "red.pdf"
+
+
+def test_refresh_appends_new_documents(index, collection):
+    collection.insert_one({"text": "purple chunk", "embedding": [1.0, 0.0, 1.0]})
+
+    assert index.refresh() == 1
+    assert len(index) == 4
+    assert index.search_by_vector([1.0, 0.0, 1.0], k=1)[0][0].page_content == "purple chunk"
+
+
+def test_refresh_reloads_after_deletes(index, collection):
+    collection.delete_one({"source": "red.pdf"})
+
+    index.refresh()
+
+    assert sorted(doc.page_content for doc in index._documents) == ["blue chunk", "green chunk"]
+
+
+def test_updates_do_not_touch_the_lists_a_search_already_holds(index, collection):
+    matrix, ids, documents = index._matrix, index._ids, index._documents
+    new = {"_id": "new", "text": "white chunk", "embedding": [1.0, 1.0, 1.0]}
+
+    index._append(*index._build([new])[:3])
+    index._remove(ids[0])
+
+    assert (len(matrix), len(ids), len(documents)) == (3, 3, 3)
+    assert [doc.page_content for doc in index._documents] == ["green chunk", "blue chunk", "white chunk"]
+    assert index._matrix.shape == (3, 3)
+
+
+def test_append_skips_documents_already_mirrored(index):
+    raw = {"_id": index._ids[0], "text": "red chunk", "embedding": VECTORS["red"]}
+
+    index._append(*index._build([raw])[:3])
+
+    assert len(index) == 3
+
+
+class _Stream:
+    def __init__(self, changes: list[dict]):
+        self.changes = changes
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def try_next(self):
+        return self.changes.pop(0) if self.changes else None
+
+
+def test_change_stream_is_reopened_after_invalidate(index, collection):
+    watched = []
+
+    def watch(full_document, start_after):
+        watched.append(start_after)
+        if len(watched) == 1:
+            collection.drop()
+            return _Stream([{"operationType": "drop"}, {"_id": "token", "operationType": "invalidate"}])
+        index._stop.set()
+        return _Stream([])
+
+    collection.watch = watch
+
+    assert index._follow_change_stream()
+    assert watched == [None, "token"]
+    assert len(index) == 0